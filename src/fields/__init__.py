@@ -10,9 +10,7 @@ How it works: the library is composed of 2 major parts:
   * Construction phase (there are no bases). Make new instances of the `Factory` with new state.
   * Usage phase. When subclassed (there are bases) it will use the sealer to return the final class.
 """
-import linecache
 import sys
-import zlib
 from itertools import chain
 from operator import itemgetter
 
@@ -30,18 +28,44 @@ __all__ = (
     'Fields',
     'PrintableMixin',
     'SlotsFields',
+    'StructFields',
     'Tuple',
     # advanced stuff
     'factory',
     'make_init_func',
+    'SealerPipeline',
     'class_sealer',
     'slots_class_sealer',
     'tuple_sealer',
+    'ctypes_sealer',
+    'field_types',
+    'computed',
+    'default_factory',
+    'row_factory',
+    'row_factory_for',
+    'generated_code',
     # convenience things
-    'Namespace'
+    'Namespace',
+    'ShapedNamespace',
 )
 PY2 = sys.version_info[0] == 2
 MISSING = object()
+_COMPARISON_OPERATORS = {
+    '__eq__': '==',
+    '__ne__': '!=',
+    '__lt__': '<',
+    '__le__': '<=',
+    '__gt__': '>',
+    '__ge__': '>=',
+}
+# names used by the generated __init__/__new__ (a field with one of these names would shadow them)
+_RESERVED_NAMES = frozenset(['self', 'cls', 'super', 'tuple'])
+PLAIN_CLASS_ATTRIBUTES = frozenset([
+    '__module__', '__qualname__', '__doc__', '__slots__', '__dict__', '__weakref__',
+    '__firstlineno__', '__static_attributes__', '__fields_changes__', '__fields_cache__', '__fields_generated__',
+    '__fields_sources__', '__fields_array_view__', '__fields_record_layout__', '__fields_lazy_layout__',
+    '__fields_last_row__',
+])
 
 
 def _with_metaclass(meta, *bases):
@@ -63,6 +87,9 @@ class __base__(object):
         pass
 
 
+_NOOP_INITS = (object.__dict__['__init__'], __base__.__dict__['__init__'])
+
+
 def make_init_func(fields, defaults,
                    baseclass_name='FieldsBase',
                    header_name='__init__',
@@ -73,7 +100,35 @@ def make_init_func(fields, defaults,
                    super_call=True,
                    super_call_pass_allargs=True,
                    super_call_pass_kwargs=True,
-                   set_attributes=True):
+                   set_attributes=True,
+                   body_start='',
+                   body_end=''):
+    code, func_name, global_namespace, local_namespace = _init_source(
+        fields, defaults, baseclass_name, header_start, header_end, super_call_start, super_call_end,
+        super_call, super_call_pass_allargs, super_call_pass_kwargs, set_attributes, body_start, body_end
+    )
+    _exec_code(code, 'init', global_namespace, local_namespace)
+    local_namespace[header_name] = local_namespace.pop(func_name)
+    return global_namespace, local_namespace
+
+
+def _init_source(fields, defaults,
+                 baseclass_name='FieldsBase',
+                 header_start='def {func_name}(self',
+                 header_end='):\n',
+                 super_call_start='super({baseclass_name}, self).__init__(',
+                 super_call_end=')\n',
+                 super_call=True,
+                 super_call_pass_allargs=True,
+                 super_call_pass_kwargs=True,
+                 set_attributes=True,
+                 body_start='',
+                 body_end=''):
+    """
+    Return the code of the function made by :func:`make_init_func` (it takes the same arguments, except
+    ``header_name``), the name it has in the code, and the global and local namespaces it needs. The function is bound
+    to ``header_name`` after the code runs (an assignment in the code makes ``compile()`` slower).
+    """
     func_name = '__fields_init_for__{0}__'.format('__'.join(fields))
     parts = [header_start.format(func_name=func_name)]
     still_positional = True
@@ -87,6 +142,9 @@ def make_init_func(fields, defaults,
             raise ValueError("Cannot have positional fields after fields with defaults. "
                              "Field {0!r} is missing a default value!".format(var))
     parts.append(header_end if fields else header_end.lstrip(', '))
+    factories, factories_namespace = _default_factories(fields, defaults)
+    parts.append(factories)
+    parts.append(body_start)
     if set_attributes:
         for var in fields:
             parts.append('    self.{0} = {0}\n'.format(var))
@@ -101,27 +159,1060 @@ def make_init_func(fields, defaults,
             parts.append(super_call_end)
         else:
             parts.append(super_call_end.lstrip(', '))
+    parts.append(body_end)
     local_namespace = dict(defaults)
+    local_namespace.update((name, MISSING) for name in local_namespace if isinstance(local_namespace[name], default_factory))
     global_namespace = dict(super=super) if super_call else {}
-    parts.append('{0} = {1}\ndel {1}'.format(header_name, func_name))
-    code = ''.join(parts)
+    global_namespace.update(factories_namespace)
+    return ''.join(parts), func_name, global_namespace, local_namespace
 
-    filename = "<fields-init-function-%x>" % zlib.adler32(code.encode('utf8'))
-    codeobj = compile(code, filename, 'exec')
+
+_make_init_func = make_init_func
+
+
+def _exec_code(code, kind, global_namespace, local_namespace):
+    import linecache
+    import zlib
+
+    filename = "<fields-%s-function-%x>" % (kind, zlib.adler32(code.encode('utf8')))
+    key = filename, code
+    codeobj = _compiled_code.get(key)
+    if codeobj is None:
+        # sealing the same layout again (eg: the same chain in many places, or classes made at runtime) skips compile()
+        codeobj = _compiled_code[key] = compile(code, filename, 'exec')
     if PY2:
         exec("exec codeobj in global_namespace, local_namespace")
     else:
         exec(codeobj, global_namespace, local_namespace)
-    linecache.cache[filename] = len(code), None, code.splitlines(), filename
-    return global_namespace, local_namespace
+    linecache.cache[filename] = len(code), None, code.splitlines(True), filename
+
+
+_claimed_sources = {}
+_source_users = {}
+_source_owners = {}
+
+
+def _code_functions(value):
+    """
+    Return the plain functions wrapped by a class attribute (function, classmethod, staticmethod or property).
+    """
+    if isinstance(value, (classmethod, staticmethod)):
+        value = value.__func__
+    if isinstance(value, property):
+        return [func for func in (value.fget, value.fset, value.fdel) if hasattr(func, '__code__')]
+    return [value] if hasattr(value, '__code__') else []
+
+
+def _retitle_code(code, filename, name=None, qualname=None):
+    changes = dict(
+        co_filename=filename,
+        co_consts=tuple(
+            _retitle_code(const, filename) if isinstance(const, type(code)) else const
+            for const in code.co_consts
+        ),
+    )
+    if name is not None:
+        changes['co_name'] = name
+    if qualname is not None and hasattr(code, 'co_qualname'):
+        changes['co_qualname'] = qualname
+    return code.replace(**changes)
+
+
+def _claim_generated_code(cls, claimer=None):
+    """
+    Rename the generated functions in ``cls.__dict__`` (and their code objects) after ``claimer`` (a user's class), so
+    profilers, coverage and tracebacks show ``<fields-init mymodule.Point>:1(__init__)`` instead of
+    ``<fields-init-function-1a2b3c>:1(__fields_init_for__x__y__)``. Only the first claim counts (sealed bases can be
+    subclassed many times). Requires Python 3.8+ (``CodeType.replace``), it does nothing otherwise.
+
+    The :mod:`linecache` entries made for the new names are removed when ``cls`` is garbage collected. If ``claimer``
+    has a ``__fields_sources__`` set, the original filenames of the code are added to it (see
+    :class:`fields.namespaces.ShapedNamespace`).
+    """
+    sources = claimer.__dict__.get('__fields_sources__') if claimer is not None else None
+    if sources is not None:
+        sources.update(
+            func.__code__.co_filename for value in cls.__dict__.values() for func in _code_functions(value)
+            if func.__code__.co_filename.startswith('<fields-')
+        )
+    if not hasattr(_claim_generated_code.__code__, 'replace'):
+        return
+    import linecache
+
+    if claimer is None:
+        module, qualname = cls.__dict__.get('__fields_claimed_by__') or (
+            cls.__module__, getattr(cls, '__qualname__', cls.__name__)
+        )
+    else:
+        module, qualname = claimer.__module__, getattr(claimer, '__qualname__', claimer.__name__)
+        if claimer is not cls and '__fields_claimed_by__' not in cls.__dict__:
+            cls.__fields_claimed_by__ = module, qualname
+    claimed = set()
+    for name, value in list(cls.__dict__.items()):
+        for func in _code_functions(value):
+            code = func.__code__
+            kind, _, suffix = code.co_filename[len('<fields-'):].rpartition('-function-')
+            if not code.co_filename.startswith('<fields-') or not kind or '-' in suffix:
+                continue
+            entry = linecache.cache.get(code.co_filename)
+            lines = entry[2] if entry else None
+            filename = base_filename = '<fields-{0} {1}.{2}>'.format(kind, module, qualname)
+            counter = 1
+            while _claimed_sources.get(filename, lines) != lines:
+                counter += 1
+                filename = '{0}-{1}>'.format(base_filename[:-1], counter)
+            func.__code__ = _retitle_code(code, filename, name, '{0}.{1}'.format(qualname, name))
+            func.__name__ = name
+            func.__qualname__ = '{0}.{1}'.format(qualname, name)
+            _claimed_sources[filename] = lines
+            if entry:
+                linecache.cache[filename] = entry[0], None, lines, filename
+            claimed.add(filename)
+    if claimed:
+        _track_sources(cls, claimed)
+
+
+def _track_sources(cls, filenames):
+    """
+    Forget the claimed ``filenames`` (see :func:`_forget_sources`) when ``cls`` is garbage collected. Classes that
+    claim the same source share the filename, so the entries are counted.
+    """
+    sources = cls.__dict__.get('__fields_sources__')
+    if sources is None:
+        sources = set()
+        cls.__fields_sources__ = sources
+        _set_weak_entry(_source_owners, id(cls), cls, lambda: _forget_sources(sources))
+    for filename in filenames:
+        if filename not in sources:
+            sources.add(filename)
+            _source_users[filename] = _source_users.get(filename, 0) + 1
+
+
+def _forget_sources(filenames):
+    """
+    Remove the :mod:`linecache` entries (and the claimed names) of generated code that isn't used anymore (unless other
+    classes still use a claimed name).
+    """
+    import linecache
+
+    for filename in filenames:
+        users = _source_users.pop(filename, 1) - 1
+        if users:
+            _source_users[filename] = users
+        else:
+            linecache.cache.pop(filename, None)
+            _claimed_sources.pop(filename, None)
+
+
+def generated_code(cls):
+    """
+    Return the code objects of the generated methods that ``cls`` uses (``__init__``, ``__new__``, ``from_dict`` etc),
+    so profiler or coverage output can be mapped back to record classes. The generated code is named after the first
+    subclass of the sealed container (eg: ``<fields-init mymodule.Point>`` for the filename and ``Point.__init__`` for
+    the qualified name, on Python 3.8+).
+
+    Args:
+        cls: A class that has a sealed container as a base (or a factory, eg: ``Fields.a.b``).
+    Return:
+        An ``OrderedDict`` with the attribute names and the code objects (for properties the getter is used).
+    """
+    if isinstance(cls, _Factory):
+        cls = ~cls
+    result = OrderedDict()
+    seen = set()
+    for klass in cls.__mro__:
+        for name, value in klass.__dict__.items():
+            if name in seen:
+                continue
+            seen.add(name)
+            for func in _code_functions(value):
+                if func.__code__.co_filename.startswith('<fields-'):
+                    result[name] = func.__code__
+                    break
+    return result
+
+
+class _LRUCache(object):
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+
+    def get(self, key):
+        value = self.data.get(key)
+        if value is not None:
+            # move it to the end (misses are the common case when sealing, they don't raise)
+            self.data[key] = self.data.pop(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+
+_compiled_code = _LRUCache(256)
+_row_constructors = _LRUCache(256)
+_row_factories = _LRUCache(256)
+
+
+def _make_row_constructor(fields, columns):
+    positions = {}
+    for position, column in enumerate(columns):
+        positions.setdefault(column, position)
+    args = []
+    positional = True
+    for field in fields:
+        if field in positions:
+            if positional:
+                args.append('row[{0}]'.format(positions[field]))
+            else:
+                args.append('{0}=row[{1}]'.format(field, positions[field]))
+        else:
+            positional = False
+    func_name = '__fields_row_factory_for__{0}__'.format('__'.join(fields))
+    local_namespace = {}
+    _exec_code('def {0}(cls, row):\n    return cls({1})\n'.format(func_name, ', '.join(args)),
+               'row-factory', {}, local_namespace)
+    return local_namespace[func_name]
+
+
+def _row_factory(cls, cursor, row):
+    """
+    Make an instance from a DB-API row (the fields are matched with the columns by name). Can be used as
+    ``connection.row_factory`` with the ``sqlite3`` module. Columns that don't match a field are ignored.
+    """
+    description = cursor.description
+    # the constructor for the last description is kept on the class, and the cached constructors take the class as an
+    # argument (so the caches don't keep classes alive)
+    last = cls.__dict__.get('__fields_last_row__')
+    if last is None or last[0] is not description:
+        key = cls.__fields__, tuple(column[0] for column in description)
+        constructor = _row_constructors.get(key)
+        if constructor is None:
+            constructor = _row_constructors[key] = _make_row_constructor(*key)
+        last = cls.__fields_last_row__ = description, constructor
+    return last[1](cls, row)
+
+
+def _is_field_name(name):
+    """
+    Check if ``name`` can be used as a field by the generated code: an identifier that isn't a keyword, doesn't start
+    with ``__`` and isn't one of the names the generated functions use (eg: ``self``, ``cls`` or ``super``).
+    """
+    import keyword
+    import re
+
+    return (
+        isinstance(name, str) and re.match(r'^[^\d\W]\w*\Z', name, re.UNICODE) is not None and not keyword.iskeyword(name) and
+        not name.startswith(('__', 'FieldsBase_for__')) and name not in _RESERVED_NAMES
+    )
+
+
+def row_factory_for(description):
+    """
+    Return a row factory (a function that takes ``cursor, row``) for the given DB-API ``cursor.description``. The rows
+    are going to be instances of a :obj:`Tuple` container (named ``Row``) that has the column names as fields. Columns
+    with names that can't be used as fields (or that the generated code uses, eg: ``cls``) are renamed to ``_<position>``
+    (or the next ``_<n>`` that isn't taken).
+
+    Example:
+
+    .. sourcecode:: pycon
+
+        >>> import sqlite3
+        >>> connection = sqlite3.connect(':memory:')
+        >>> cursor = connection.execute('select 1 as a, 2 as b, 3')
+        >>> cursor.row_factory = row_factory_for(cursor.description)
+        >>> row = cursor.fetchone()
+        >>> row
+        Row(a=1, b=2, _2=3)
+        >>> row.b
+        2
+    """
+    columns = tuple(column[0] for column in description)
+    factory = _row_factories.get(columns)
+    if factory is None:
+        names = []
+        for position, column in enumerate(columns):
+            if not _is_field_name(column) or column in names:
+                column = '_{0}'.format(position)
+                while column in names or column in columns:
+                    position += 1
+                    column = '_{0}'.format(position)
+            names.append(column)
+        row_class = type('Row', (~_Factory(required=names, sealer=_SealerWrapper(tuple_sealer)),), dict(__slots__=()))
+
+        def factory(cursor, row, new=tuple.__new__):
+            return new(row_class, row)
+        _row_factories[columns] = factory
+    return factory
+
+
+def row_factory(cursor, row):
+    """
+    A generic row factory that uses :func:`row_factory_for`. Can be used as ``connection.row_factory`` with the
+    ``sqlite3`` module.
+    """
+    return row_factory_for(cursor.description)(cursor, row)
+
+
+def _aiter_from_stream(cls, reader, format='ndjson', **options):
+    """
+    Return an async iterator with the records decoded from an ``asyncio.StreamReader``. See
+    :func:`fields.streams.aiter_records` for the formats and options (Python 3.6+).
+    """
+    from fields.streams import aiter_records
+
+    return aiter_records(cls, reader, format, **options)
+
+
+def _read_csv(cls, fileobj, header=True, chunksize=1000, converters=None, **fmtparams):
+    """
+    Return a generator with the records read from a CSV file. See :func:`fields.csvio.read_csv`.
+    """
+    from fields.csvio import read_csv
+
+    return read_csv(cls, fileobj, header, chunksize, converters, **fmtparams)
+
+
+def _write_csv(cls, fileobj, records, header=True, **fmtparams):
+    """
+    Write the records to a CSV file. See :func:`fields.csvio.write_csv`.
+    """
+    from fields.csvio import write_csv
+
+    write_csv(cls, fileobj, records, header, **fmtparams)
+
+
+class _GeneratedMethods(object):
+    """
+    Descriptor that generates (with ``builder(owner, *args)``) and installs some methods on the class it's accessed
+    from, the first time it's used. Avoids compiling code for methods that are never used. Methods that ``owner``
+    gets from somewhere else in the MRO (eg: overridden by the user) are not replaced. The names of the installed
+    methods are kept in ``__fields_generated__`` (they don't count as methods added by the user, see
+    :func:`_reduce_ex_by_spec`).
+
+    If ``owner`` overrides the method (the descriptor is reached through ``super()``) the methods are installed on the
+    class that has the descriptor instead.
+    """
+    def __init__(self, name, builder, *args):
+        self.name = name
+        self.builder = builder
+        self.args = args
+
+    def __get__(self, instance, owner):
+        target = owner
+        for klass in owner.__mro__:
+            if self.name in klass.__dict__:
+                if not isinstance(klass.__dict__[self.name], _GeneratedMethods):
+                    target = next(klass for klass in owner.__mro__ if klass.__dict__.get(self.name) is self)
+                break
+        installed = []
+        for name, value in self.builder(target, *self.args).items():
+            for klass in target.__mro__:
+                if name in klass.__dict__:
+                    if isinstance(klass.__dict__[name], _GeneratedMethods):
+                        setattr(target, name, value)
+                        installed.append(name)
+                    break
+        target.__fields_generated__ = frozenset(target.__dict__.get('__fields_generated__', ())).union(installed)
+        _claim_generated_code(target)
+        return target.__dict__[self.name].__get__(instance, owner)
+
+
+def _make_hash_methods(owner, fields):
+    from fields.sharding import make_hash_methods
+
+    return make_hash_methods(owner, fields)
+
+
+def _make_json_methods(owner, fields):
+    from fields.jsonio import make_json_methods
+
+    return make_json_methods(owner, fields)
+
+
+def _construction_kind(cls, constructor):
+    """
+    Check if instances of ``cls`` can be made directly (skipping the ``__init__``/``__new__`` call) because ``cls``
+    uses the unchanged generated ``constructor``. Returns ``"tuple"``, ``"attributes"`` or ``None``.
+    """
+    if constructor is None or type(cls).__call__ is not type.__call__:
+        return None
+    if cls.__new__ is constructor and cls.__init__ is object.__init__:
+        return 'tuple'
+    if cls.__init__ is constructor and cls.__new__ is object.__new__ and cls.__setattr__ is object.__setattr__:
+        mro = cls.__mro__
+        position = [klass.__dict__.get('__init__') for klass in mro].index(constructor)
+        for klass in mro[position + 1:]:
+            init = klass.__dict__.get('__init__')
+            if init is not None:
+                return 'attributes' if init in _NOOP_INITS else None
+    return None
+
+
+def _make_from_dict_funcs(owner, fields, defaults, constructor):
+    kind = _construction_kind(owner, constructor)
+    suffix = '__'.join(fields)
+    required = [(i, field) for i, field in enumerate(fields) if field not in defaults]
+    optional = [(i, field) for i, field in enumerate(fields) if field in defaults]
+    getters = ["d[{0!r}]".format(field) if field not in defaults else
+               "(d[{0!r}] if {0!r} in d else __default{1}())".format(field, i)
+               if isinstance(defaults[field], default_factory) else
+               "d.get({0!r}, __default{1})".format(field, i)
+               for i, field in enumerate(fields)]
+    parts = [
+        "def __fields_from_dict_for__{0}__(cls, d, ignore_extra=True):\n".format(suffix),
+        "    if not ignore_extra:\n"
+        "        for key in d:\n"
+        "            if key not in __fields:\n"
+        "                raise TypeError('Unexpected field %r for %s.' % (key, cls.__name__))\n",
+    ]
+    if required:
+        parts.append("    try:\n")
+        parts.extend("        __value{0} = {1}\n".format(i, getters[i]) for i, _ in required)
+        parts.append("    except KeyError as exc:\n"
+                     "        raise TypeError('Missing field %s for %s.' % (exc, cls.__name__))\n")
+    parts.extend("    __value{0} = {1}\n".format(i, getters[i]) for i, _ in optional)
+    values = ', '.join('__value{0}'.format(i) for i in range(len(fields)))
+    if kind == 'tuple':
+        parts.append("    if cls is __owner:\n"
+                     "        return __new(cls, ({0},))\n".format(values))
+    elif kind == 'attributes':
+        parts.append("    if cls is __owner:\n"
+                     "        self = __new(cls)\n")
+        parts.extend("        self.{1} = __value{0}\n".format(i, field) for i, field in enumerate(fields))
+        parts.append("        return self\n")
+    parts.append("    return cls({0})\n\n\n".format(values))
+
+    parts.append("def __fields_from_dicts_for__{0}__(cls, dicts, ignore_extra=True):\n".format(suffix))
+    if kind:
+        parts.append("    if ignore_extra and cls is __owner:\n"
+                     "        dicts = list(dicts)\n"
+                     "        try:\n")
+        if kind == 'tuple':
+            parts.append("            return [__new(cls, ({0},)) for d in dicts]\n".format(', '.join(getters)))
+        else:
+            parts.append("            result = []\n"
+                         "            append = result.append\n"
+                         "            for d in dicts:\n"
+                         "                self = __new(cls)\n")
+            parts.extend("                self.{0} = {1}\n".format(field, getters[i]) for i, field in enumerate(fields))
+            parts.append("                append(self)\n"
+                         "            return result\n")
+        parts.append("        except KeyError:\n"
+                     "            pass\n")
+    parts.append("    from_dict = cls.from_dict\n"
+                 "    return [from_dict(d, ignore_extra) for d in dicts]\n")
+
+    global_namespace = dict(
+        ('__default{0}'.format(i), defaults[field].func if isinstance(defaults[field], default_factory) else defaults[field])
+        for i, field in optional
+    )
+    global_namespace.update(
+        __fields=frozenset(fields),
+        __owner=owner,
+        __new=tuple.__new__ if kind == 'tuple' else object.__new__,
+    )
+    local_namespace = {}
+    _exec_code(''.join(parts), 'from-dict', global_namespace, local_namespace)
+    return dict(
+        from_dict=classmethod(local_namespace['__fields_from_dict_for__{0}__'.format(suffix)]),
+        from_dicts=classmethod(local_namespace['__fields_from_dicts_for__{0}__'.format(suffix)]),
+    )
+
+
+_spec_classes = {}
+
+
+def _is_importable(cls):
+    obj = sys.modules.get(cls.__module__)
+    for name in getattr(cls, '__qualname__', cls.__name__).split('.'):
+        obj = getattr(obj, name, None)
+    return obj is cls
+
+
+def _spec_fingerprint(base):
+    fingerprint = base.__dict__.get('__fields_fingerprint__')
+    if fingerprint is None:
+        import hashlib
+        import pickle
+
+        fingerprint = hashlib.sha1(pickle.dumps(base.__fields_spec__, 2)).hexdigest()
+        base.__fields_fingerprint__ = fingerprint
+    return fingerprint
+
+
+def _reduce_ex_by_spec(self, protocol):
+    """
+    Used as ``__reduce_ex__`` by the builtin sealers. Instances of classes that can't be pickled by reference (eg:
+    classes made with ``type(name, (Fields.a.b,), {})``) are pickled as the spec of their sealed class (see
+    :func:`_unpickle_by_spec`) and the field values. Everything else is pickled as usual.
+    """
+    cls = type(self)
+    if '__fields_spec__' in cls.__dict__:
+        base = cls
+        name = None
+    else:
+        base = cls.__bases__[0]
+        name = cls.__name__
+        if (
+            len(cls.__bases__) != 1 or '__fields_spec__' not in base.__dict__ or
+            not PLAIN_CLASS_ATTRIBUTES.issuperset(
+                key for key in cls.__dict__
+                if key not in base.__fields__ and key not in cls.__dict__.get('__fields_generated__', ())
+            )
+        ):
+            return object.__reduce_ex__(self, protocol)
+    if cls.__reduce__ is not object.__reduce__ or _is_importable(cls):
+        return object.__reduce_ex__(self, protocol)
+    import pickle
+
+    try:
+        fingerprint = _spec_fingerprint(base)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return object.__reduce_ex__(self, protocol)
+    key = fingerprint, cls.__module__, name, id(cls)
+    entry = _spec_classes.get(key)
+    if entry is None or entry() is not cls:
+        _set_weak_entry(_spec_classes, key, cls)
+    if isinstance(self, tuple):
+        values = tuple(self)
+    else:
+        values = tuple(getattr(self, field) for field in base.__fields__)
+    return _unpickle_by_spec, (key, base.__fields_spec__, values)
+
+
+def _unpickle_by_spec(key, spec, values):
+    """
+    Counterpart of :func:`_reduce_ex_by_spec`. The ``key`` identifies the class (by the fingerprint of the spec, module,
+    name and the id of the class in the process that pickled it). In that process the class is found in the registry,
+    elsewhere the container is sealed again (and subclassed, if a name is given) and registered for the other instances.
+    The registry has weak references, so classes that are not used anymore can be garbage collected.
+    """
+    entry = _spec_classes.get(key)
+    cls = entry and entry()
+    if cls is None:
+        fingerprint, module, name, _ = key
+        entry = _spec_classes.get(fingerprint)
+        base = entry and entry()
+        if base is None:
+            sealer, options, fields, defaults = spec
+            defaults = OrderedDict(defaults)
+            base = ~_Factory(
+                required=tuple(field for field in fields if field not in defaults),
+                defaults=defaults,
+                sealer=_SealerWrapper(sealer, **options),
+            )
+            base.__fields_fingerprint__ = fingerprint
+            _set_weak_entry(_spec_classes, fingerprint, base)
+        if name is None:
+            cls = base
+        else:
+            cls = type(name, (base,), dict(__module__=module))
+        _set_weak_entry(_spec_classes, key, cls)
+    if issubclass(cls, tuple):
+        return tuple.__new__(cls, values)
+    obj = cls.__new__(cls)
+    for field, value in zip(cls.__fields__, values):
+        setattr(obj, field, value)
+    if getattr(cls.__setattr__, '__fields_tracking__', None) is not None:
+        obj.clear_changes()
+    return obj
+
+
+def _flatten_init(cls):
+    """
+    Give ``cls`` an ``__init__`` that does the work of all the chained ``__init__`` (made by :func:`class_sealer` with
+    ``pass_kwargs=True, flatten_init=True``) in the MRO. The fields of the first container can be passed as positional
+    arguments, the rest are keyword-only (just like in the chain). Nothing is done if there are other ``__init__``
+    methods in the MRO, or if fields are repeated (in that case, the ``__init__`` chain is used).
+    """
+    if '__init__' in cls.__dict__:
+        return
+    fields = []
+    levels = []
+    first = None
+    for klass in cls.__mro__:
+        init = klass.__dict__.get('__init__')
+        if init is None or getattr(init, '__fields_flat__', False):
+            continue
+        if first is None:
+            first = init
+        if init is object.__dict__['__init__']:
+            break
+        chain = getattr(init, '__fields_chain__', None)
+        if chain is None:
+            levels = None
+            break
+        levels.append(chain)
+        fields.extend(chain[0])
+    if not levels or len(set(fields)) != len(fields):
+        if getattr(cls.__init__, '__fields_flat__', False):
+            # an inherited flat __init__ doesn't cover this MRO, go back to the chain
+            cls.__init__ = first
+        return
+
+    parts = ['def __fields_flat_init_for__{0}__(self'.format('__'.join(fields))]
+    global_namespace = {}
+    factories = []
+    for level, (level_fields, defaults) in enumerate(levels):
+        if level == 1:
+            parts.append(', *')
+        for field in level_fields:
+            if field in defaults:
+                default = defaults[field]
+                global_namespace['__default_{0}'.format(field)] = MISSING if isinstance(default, default_factory) else default
+                parts.append(', {0}=__default_{0}'.format(field))
+            else:
+                parts.append(', {0}'.format(field))
+        code, factories_namespace = _default_factories(level_fields, defaults)
+        factories.append(code)
+        global_namespace.update(factories_namespace)
+    parts.append('):\n')
+    parts.extend(factories)
+    parts.extend('    self.{0} = {0}\n'.format(field) for field in fields)
+    if getattr(cls.__setattr__, '__fields_tracking__', None) is not None:
+        parts.append('    self.__fields_changes__ = 0\n')
+    untrack = getattr(cls, '__fields_untrack__', None)
+    if untrack is not None:
+        global_namespace['__fields_untrack'] = untrack
+        parts.append('    __fields_untrack(self)\n')
+    local_namespace = {}
+    _exec_code(''.join(parts), 'flat-init', global_namespace, local_namespace)
+    init, = local_namespace.values()
+    init.__fields_flat__ = True
+    cls.__init__ = init
+
+
+def _direct_set_attributes(fields):
+    """
+    Return the generated code that sets the attributes in ``__init__`` for classes with a generated ``__setattr__``
+    (``gc_untrack`` or computed fields): it's skipped (the attributes are set with the base ``__setattr__``) if the class
+    still uses that ``__setattr__``, as there's nothing for it to do on new instances.
+    """
+    return '    if __fields_type(self).__setattr__ is __fields_own_setattr:\n{0}    else:\n{1}'.format(
+        ''.join('        __fields_setattr(self, {0!r}, {0})\n'.format(field) for field in fields),
+        ''.join('        self.{0} = {0}\n'.format(field) for field in fields),
+    )
+
+
+def _make_tracking_funcs(tracked, next_setattr):
+    """
+    Make the methods for change tracking: a ``__setattr__`` that sets the bit of the field in ``__fields_changes__``
+    (an int) and calls ``next_setattr``, ``changed_fields``, ``clear_changes`` and ``diff``.
+    """
+    global_namespace = dict(
+        __setattr=next_setattr,
+        __object_setattr=object.__setattr__,
+        __bits=dict((field, 1 << i) for i, field in enumerate(tracked)),
+        __bits_items=tuple((field, 1 << i) for i, field in enumerate(tracked)),
+    )
+    parts = [
+        'def __setattr__(self, name, value):\n'
+        '    bit = __bits.get(name)\n'
+        '    if bit is not None:\n'
+        '        try:\n'
+        '            __object_setattr(self, "__fields_changes__", self.__fields_changes__ | bit)\n'
+        '        except AttributeError:\n'
+        '            __object_setattr(self, "__fields_changes__", bit)\n'
+        '    __setattr(self, name, value)\n',
+        'def changed_fields(self):\n'
+        '    changes = getattr(self, "__fields_changes__", 0)\n'
+        '    return tuple([field for field, bit in __bits_items if changes & bit])\n',
+        'def clear_changes(self):\n'
+        '    __object_setattr(self, "__fields_changes__", 0)\n',
+        'def diff(self, other):\n'
+        '    result = {}\n' + ''.join(
+            '    if self.{0} != other.{0}:\n'
+            '        result[{0!r}] = self.{0}\n'.format(field) for field in tracked
+        ) + '    return result\n',
+    ]
+    local_namespace = {}
+    _exec_code('\n'.join(parts), 'tracking', global_namespace, local_namespace)
+    local_namespace['__setattr__'].__fields_tracking__ = tuple(tracked)
+    local_namespace['__setattr__'].__fields_next__ = next_setattr
+    return local_namespace
+
+
+def _merge_tracking(cls):
+    """
+    Make the tracking methods again if ``cls`` has more than one tracking container in the MRO (the bits of all the
+    tracked fields need to fit in the same ``__fields_changes__``).
+    """
+    current = getattr(cls.__setattr__, '__fields_tracking__', None)
+    if current is None:
+        return
+    tracked = []
+    for klass in cls.__mro__:
+        for field in klass.__dict__.get('__fields_tracked__', ()):
+            if field not in tracked:
+                tracked.append(field)
+    if tuple(tracked) != current:
+        for name, value in _make_tracking_funcs(tracked, cls.__setattr__.__fields_next__).items():
+            setattr(cls, name, value)
+
+
+class computed(object):
+    """
+    Marker for computed fields, used as the default value of a field in the chain (eg:
+    ``Fields.first.last.name[computed(lambda self: self.first + ' ' + self.last, 'first', 'last')]``).
+
+    Computed fields are not arguments of the generated ``__init__`` and are not compared, hashed or printed. The value
+    is computed on first access and cached in the instance (in the ``__fields_cache__`` slot for
+    :func:`slots_class_sealer`). Assigning a source field drops the cached value.
+
+    Args:
+        func: Callable that takes the instance and returns the value.
+        sources: The names of the fields the value depends on (default: all the fields).
+    """
+    def __init__(self, func, *sources):
+        self.func = func
+        self.sources = sources
+
+    def __repr__(self):
+        return "computed({0})".format(", ".join(repr(value) for value in (self.func,) + self.sources))
+
+
+class default_factory(object):
+    """
+    Marker for defaults that are made for each instance (eg: ``Fields.name.tags[default_factory(list)]``), instead of
+    one value shared by all the instances. The generated ``__init__`` (or ``__new__``) calls ``func`` when the argument
+    is not given.
+
+    Args:
+        func: Callable (without arguments) that returns the default value.
+    """
+    def __init__(self, func):
+        self.func = func
+
+    def __repr__(self):
+        return "default_factory({0!r})".format(self.func)
+
+
+def _default_factories(fields, defaults):
+    """
+    Return the generated code that replaces the missing arguments that have a :class:`default_factory` default (they
+    get ``MISSING`` in the signature), and the global names it needs.
+    """
+    parts = []
+    global_namespace = {}
+    for field in fields:
+        if field in defaults and isinstance(defaults[field], default_factory):
+            global_namespace['__fields_factory_{0}'.format(field)] = defaults[field].func
+            parts.append('    if {0} is __fields_missing:\n'
+                         '        {0} = __fields_factory_{0}()\n'.format(field))
+    if parts:
+        global_namespace['__fields_missing'] = MISSING
+    return ''.join(parts), global_namespace
+
+
+def _split_computed(fields, defaults):
+    """
+    Separate the computed fields (the ones with a :class:`computed` default) from ``fields`` and ``defaults``.
+    """
+    defaults = OrderedDict(defaults)
+    computed_fields = OrderedDict(
+        (field, defaults.pop(field)) for field in fields if isinstance(defaults.get(field), computed)
+    )
+    fields = [field for field in fields if field not in computed_fields]
+    for name, marker in computed_fields.items():
+        unknown = [source for source in marker.sources if source not in fields]
+        if unknown:
+            raise TypeError("Computed field %r depends on unknown fields %r." % (name, unknown))
+    return fields, defaults, computed_fields
+
+
+def _compute_field(obj, name, func):
+    cache = getattr(obj, '__fields_cache__', None)
+    if cache is None:
+        cache = {}
+        setattr(obj, '__fields_cache__', cache)
+    value = cache[name] = func(obj)
+    return value
+
+
+def _make_computed_funcs(computed_fields, fields, next_setattr):
+    """
+    Make the properties for the computed fields and a ``__setattr__`` that drops the cached values when a source field
+    is assigned (and calls ``next_setattr``).
+    """
+    invalidates = OrderedDict()
+    for name, marker in computed_fields.items():
+        for source in marker.sources or fields:
+            invalidates.setdefault(source, []).append(name)
+    global_namespace = dict(
+        __setattr=next_setattr,
+        __getattr=getattr,
+        __compute=_compute_field,
+        __invalidates=dict((source, tuple(names)) for source, names in invalidates.items()),
+    )
+    parts = [
+        'def __setattr__(self, name, value):\n'
+        '    __setattr(self, name, value)\n'
+        '    names = __invalidates.get(name)\n'
+        '    if names is not None:\n'
+        '        cache = __getattr(self, "__fields_cache__", None)\n'
+        '        if cache:\n'
+        '            for name in names:\n'
+        '                cache.pop(name, None)\n'
+    ]
+    for i, (name, marker) in enumerate(computed_fields.items()):
+        global_namespace['__func{0}'.format(i)] = marker.func
+        parts.append(
+            'def {0}(self):\n'
+            '    try:\n'
+            '        return self.__fields_cache__[{0!r}]\n'
+            '    except (AttributeError, KeyError, TypeError):\n'
+            '        return __compute(self, {0!r}, __func{1})\n'.format(name, i)
+        )
+    local_namespace = {}
+    _exec_code('\n'.join(parts), 'computed', global_namespace, local_namespace)
+    return dict(
+        (name, value if name == '__setattr__' else property(value)) for name, value in local_namespace.items()
+    )
+
+
+_CONVERSIONS = ('as_dict', 'as_tuple')
+_MIXIN_METHODS = ('__eq__', '__ne__', '__lt__', '__le__', '__gt__', '__ge__', '__hash__', '__repr__', 'as_dict', 'as_tuple')
+
+
+def _field_accessor(cls, field, target):
+    """
+    Return an expression that reads ``field`` from ``target`` (an instance of ``cls``). Tuple subclasses that use
+    ``property(itemgetter(index))`` for the field get an indexing expression, everything else gets attribute access
+    (fast for both ``__dict__`` and ``__slots__``).
+    """
+    if issubclass(cls, tuple):
+        for klass in cls.__mro__:
+            if field in klass.__dict__:
+                descriptor = klass.__dict__[field]
+                if isinstance(descriptor, property) and type(descriptor.fget) is itemgetter:
+                    _, args = descriptor.fget.__reduce__()
+                    if len(args) == 1 and isinstance(args[0], int):
+                        return '{0}[{1}]'.format(target, args[0])
+                break
+    return '{0}.{1}'.format(target, field)
+
+
+def _comparison_code(name, self_values, other_values):
+    """
+    Return the generated code for a comparison method (or ``__hash__``) that compares the given value expressions.
+    """
+    if name == '__hash__':
+        return ('def __hash__(self):\n'
+                '    return hash(({0}))\n'.format(self_values))
+    return ('def {0}(self, other):\n'
+            '    if isinstance(other, self.__class__):\n'
+            '        return ({1}) {2} ({3})\n'
+            '    else:\n'
+            '        return NotImplemented\n'.format(name, self_values, _COMPARISON_OPERATORS[name], other_values))
+
+
+def _check_key_fields(fields, key_fields):
+    if key_fields is None:
+        return tuple(fields)
+    key_fields = (key_fields,) if isinstance(key_fields, str) else tuple(key_fields)
+    unknown = [field for field in key_fields if field not in fields]
+    if unknown or not key_fields:
+        raise TypeError("Invalid key_fields %r (must be a non-empty subset of %r)." % (key_fields, tuple(fields)))
+    return key_fields
+
+
+def _specialize_mixin(cls, mixin, fields, key_fields=None):
+    """
+    Replace the generic (``getattr`` based) methods of ``mixin`` that ``cls`` would use with methods generated for the
+    storage layout of ``cls``. Methods that are overridden somewhere in the MRO are left alone. The comparisons and
+    ``__hash__`` only use ``key_fields`` (default: all the fields).
+    """
+    names = []
+    for name in _MIXIN_METHODS:
+        generic = mixin.__dict__.get(name)
+        if generic is not None:
+            for klass in cls.__mro__:
+                if name in klass.__dict__:
+                    if klass.__dict__[name] is generic:
+                        names.append(name)
+                    break
+    if not names:
+        return
+    pipeline = SealerPipeline(fields, lambda field, target: _field_accessor(cls, field, target), kind='mixin')
+    comparisons = [name for name in names if name in _COMPARISON_OPERATORS or name == '__hash__']
+    if comparisons:
+        pipeline.add_comparisons(key_fields, comparisons)
+    if '__repr__' in names:
+        pipeline.add_repr()
+    conversions = [name for name in names if name in _CONVERSIONS]
+    if conversions:
+        pipeline.add_conversions(conversions)
+    for name, method in pipeline.compile().items():
+        setattr(cls, name, method)
+
+
+def _attribute_accessor(field, target):
+    return '{0}.{1}'.format(target, field)
+
+
+class SealerPipeline(object):
+    """
+    Builds the methods of a sealed class from source fragments: each feature (``__init__``, comparisons, ``__hash__``,
+    ``__repr__``, conversions, or anything a custom sealer adds with :meth:`add`) contributes some functions, and all the
+    functions are compiled together, with a single ``compile()`` call.
+
+    Args:
+        fields (list): The field names.
+        accessor: Optional callable that takes ``field, target`` and returns an expression that reads the field from
+            ``target`` (default is attribute access, eg: ``self.a``).
+        kind (str): Used in the filename of the generated code (eg: ``<fields-sealer-function-...>``).
+
+    Example:
+
+    .. sourcecode:: pycon
+
+        >>> pipeline = SealerPipeline(['x', 'y'])
+        >>> _ = pipeline.add_init({'y': 0}, super_call=False)
+        >>> _ = pipeline.add_repr()
+        >>> _ = pipeline.add('def norm(self):\\n    return abs(self.x) + abs(self.y)\\n', ['norm'])
+        >>> Point = type('Point', (object,), pipeline.compile())
+        >>> Point(3, -4)
+        Point(x=3, y=-4)
+        >>> Point(3, -4).norm()
+        7
+    """
+    def __init__(self, fields, accessor=None, kind='sealer'):
+        self.fields = tuple(fields)
+        self.accessor = accessor or _attribute_accessor
+        self.kind = kind
+        self.parts = []
+        self.names = []
+        self.aliases = []
+        self.global_namespace = {}
+        self.local_namespace = {}
+
+    def values(self, target, fields=None):
+        """
+        Return the expressions that read ``fields`` (default: all the fields) from ``target``, each followed by a comma.
+        """
+        return ''.join('{0}, '.format(self.accessor(field, target)) for field in (self.fields if fields is None else fields))
+
+    def add(self, code, names, global_namespace=None, local_namespace=None):
+        """
+        Add the source of some functions.
+
+        Args:
+            code (str): Module-level code that binds ``names``.
+            names (list): The names of the functions (that :meth:`compile` returns).
+            global_namespace (dict): Global names used by the functions. The global namespace is shared by all the
+                functions, so the names should be unique (eg: prefixed with ``__``).
+            local_namespace (dict): Names used while the code runs (eg: default argument values).
+        Return:
+            The shared global namespace (it can be updated later, until the functions are called).
+        """
+        self.parts.append(code)
+        self.names.extend(names)
+        self.global_namespace.update(global_namespace or ())
+        self.local_namespace.update(local_namespace or ())
+        return self.global_namespace
+
+    def add_init(self, defaults, baseclass_name='FieldsBase', **options):
+        """
+        Add an ``__init__`` (or the ``header_name`` function) made like :func:`make_init_func` does, with the same
+        options.
+        """
+        header_name = options.pop('header_name', '__init__')
+        code, func_name, global_namespace, local_namespace = _init_source(self.fields, defaults, baseclass_name, **options)
+        self.aliases.append((header_name, func_name))
+        return self.add(code, [header_name], global_namespace, local_namespace)
+
+    def add_comparisons(self, key_fields=None, names=None):
+        """
+        Add the comparison methods and ``__hash__`` (or just the given ``names``). They only use ``key_fields`` (default:
+        all the fields) and only compare instances of the same class.
+        """
+        names = list(_COMPARISON_OPERATORS) + ['__hash__'] if names is None else names
+        return self.add(self._comparisons_source(key_fields, names), names)
+
+    def add_repr(self):
+        """
+        Add a ``__repr__`` that looks like ``ClassName(a=1, b=2)``.
+        """
+        return self.add(self._repr_source(), ['__repr__'])
+
+    def add_conversions(self, names=None):
+        """
+        Add ``as_dict`` and ``as_tuple`` (or just the given ``names``). They are properties.
+        """
+        names = list(_CONVERSIONS) if names is None else names
+        return self.add(self._conversions_source(names), names)
+
+    def _comparisons_source(self, key_fields, names):
+        self_values = self.values('self', key_fields)
+        other_values = self.values('other', key_fields)
+        return '\n'.join(_comparison_code(name, self_values, other_values) for name in names)
+
+    def _repr_source(self):
+        return (
+            'def __repr__(self):\n'
+            '    return "{{0}}({0})".format(self.__class__.__name__, {1})\n'.format(
+                ', '.join('{0}={{{1}!r}}'.format(field, i) for i, field in enumerate(self.fields, 1)),
+                self.values('self')
+            )
+        )
+
+    def _conversions_source(self, names):
+        parts = []
+        if 'as_dict' in names:
+            parts.append('def as_dict(self):\n'
+                         '    return {{{0}}}\n'.format(', '.join(
+                             '{0!r}: {1}'.format(field, self.accessor(field, 'self')) for field in self.fields
+                         )))
+        if 'as_tuple' in names:
+            parts.append('def as_tuple(self):\n'
+                         '    return ({0})\n'.format(self.values('self')))
+        parts.extend('{0} = property({0})\n'.format(name) for name in names)
+        return ''.join(parts)
+
+    def compile(self):
+        """
+        Compile the code of all the features and return a dict with the functions (by name).
+        """
+        local_namespace = dict(self.local_namespace)
+        if self.parts:
+            _exec_code('\n'.join(self.parts), self.kind, self.global_namespace, local_namespace)
+        for name, func_name in self.aliases:
+            local_namespace[name] = local_namespace.pop(func_name)
+        return OrderedDict([(name, local_namespace[name]) for name in self.names])
 
 
 def class_sealer(fields, defaults,
                  base=__base__, make_init_func=make_init_func,
-                 initializer=True, comparable=True, printable=True, convertible=False, pass_kwargs=False):
+                 initializer=True, comparable=True, printable=True, convertible=False, pass_kwargs=False,
+                 flatten_init=False, tracking=False, gc_untrack=False, key_fields=None):
     """
     This sealer makes a normal container class. It's mutable and supports arguments with default values.
+
+    With ``pass_kwargs=True`` the generated ``__init__`` passes the extra keyword arguments to the next ``__init__`` in
+    the MRO (so multiple containers can be used as bases). With ``flatten_init=True`` (Python 3.6+) subclasses get a
+    single ``__init__`` that sets the fields of all the containers in the MRO, instead of going through every
+    ``__init__`` in the chain (it's not done if there's any other ``__init__`` in the MRO).
+
+    With ``tracking=True`` assigning a field marks it as changed (in a bitmask stored in ``__fields_changes__``). The
+    class gets ``changed_fields()`` (the names of the changed fields), ``clear_changes()`` and ``diff(other)`` (a dict
+    with the fields that have different values in ``other``). New instances start with no changes.
+
+    With ``gc_untrack=True`` (CPython only) new instances are removed from the cyclic garbage collector if all their
+    attributes have atomic values (``None``, numbers, strings or bytes): they can't be part of a reference cycle, so the
+    GC doesn't need to look at them. Assigning any other value (via ``setattr``) adds the instance back. It works best
+    with ``__slots__`` (:func:`slots_class_sealer`), otherwise the instance dict needs to be checked too.
+
+    Fields with a :class:`computed` default are computed on first access and cached.
+
+    With ``key_fields`` (a list of field names) the comparisons and ``__hash__`` only use those fields (eg: an id), the
+    generated methods don't touch the other fields.
     """
+    fields, defaults, computed_fields = _split_computed(fields, defaults)
+    if key_fields is not None:
+        key_fields = _check_key_fields(fields, key_fields)
     baseclass_name = 'FieldsBase_for__{0}'.format('__'.join(fields))
     if pass_kwargs:
         options = dict(
@@ -131,15 +1222,94 @@ def class_sealer(fields, defaults,
         )
     else:
         options = {}
+    if tracking:
+        options['body_end'] = '    self.__fields_changes__ = 0\n'
+    next_setattr = base.__setattr__
+    direct_namespace = dict(__fields_type=type, __fields_setattr=next_setattr)
+    untrack = None
+    if gc_untrack:
+        from fields.gcuntrack import make_setattr
+        from fields.gcuntrack import make_untracker
+        from fields.gcuntrack import untrack_check
+
+        untrack = make_untracker(fields)
+        if untrack is not None:
+            next_setattr = make_setattr(next_setattr)
+            options['body_end'] = options.get('body_end', '') + untrack_check(fields)
+    if computed_fields:
+        computed_funcs = _make_computed_funcs(computed_fields, fields, next_setattr)
+        next_setattr = computed_funcs['__setattr__']
+    if next_setattr is not base.__setattr__:
+        direct_namespace['__fields_own_setattr'] = next_setattr
+        options['set_attributes'] = False
+        options['body_start'] = _direct_set_attributes(fields)
+        if computed_fields:
+            options['body_start'] = '    __fields_setattr(self, "__fields_cache__", None)\n' + options['body_start']
+
+    if comparable and key_fields is not None:
+        # the comparisons that only use some fields are generated, and compiled together with the __init__
+        pipeline = SealerPipeline(fields)
+        pipeline.add_comparisons(key_fields)
+        if initializer and make_init_func is _make_init_func:
+            pipeline.add_init(defaults, baseclass_name, **options)
+        methods = pipeline.compile()
+    else:
+        methods = {}
 
     if initializer:
-        global_namespace, local_namespace = make_init_func(fields, defaults, baseclass_name, **options)
+        if '__init__' in methods:
+            global_namespace, local_namespace = pipeline.global_namespace, methods
+        else:
+            global_namespace, local_namespace = make_init_func(fields, defaults, baseclass_name, **options)
+        init = local_namespace['__init__'] if make_init_func is _make_init_func and untrack is None else None
+        if untrack is not None:
+            global_namespace.update(untrack.namespace)
+        if not options.get('set_attributes', True):
+            global_namespace.update(direct_namespace)
+        if flatten_init and pass_kwargs and init is not None:
+            init.__fields_chain__ = tuple(fields), dict(defaults)
+    else:
+        init = None
 
     class FieldsBase(base):
+        __fields__ = tuple(fields)
+        __reduce_ex__ = _reduce_ex_by_spec
+        row_factory = classmethod(_row_factory)
+        aiter_from_stream = classmethod(_aiter_from_stream)
+        read_csv = classmethod(_read_csv)
+        write_csv = classmethod(_write_csv)
+        from_dict = _GeneratedMethods('from_dict', _make_from_dict_funcs, fields, defaults, init)
+        from_dicts = _GeneratedMethods('from_dicts', _make_from_dict_funcs, fields, defaults, init)
+        stable_hash = _GeneratedMethods('stable_hash', _make_hash_methods, fields)
+        fingerprint = _GeneratedMethods('fingerprint', _make_hash_methods, fields)
+        to_json = _GeneratedMethods('to_json', _make_json_methods, fields)
+
+        if flatten_init or not initializer or tracking:
+            def __init_subclass__(cls, **kwargs):
+                super(FieldsBase, cls).__init_subclass__(**kwargs)
+                if tracking:
+                    _merge_tracking(cls)
+                if flatten_init:
+                    _flatten_init(cls)
+                if not initializer:
+                    _specialize_mixin(cls, FieldsBase, fields, key_fields)
+                _claim_generated_code(cls, cls)
+
+        if untrack is not None:
+            __fields_untrack__ = staticmethod(untrack)
+            __setattr__ = next_setattr
+        if computed_fields:
+            __fields_computed__ = tuple(computed_fields)
+            locals().update(computed_funcs)
+        if tracking:
+            __fields_tracked__ = tuple(fields)
+            locals().update(_make_tracking_funcs(fields, next_setattr))
+
+        locals().update(methods)
         if initializer:
             __init__ = local_namespace['__init__']
 
-        if comparable:
+        if comparable and key_fields is None:
             def __eq__(self, other):
                 if isinstance(other, self.__class__):
                     return tuple(getattr(self, a) for a in fields) == tuple(getattr(other, a) for a in fields)
@@ -200,44 +1370,89 @@ def class_sealer(fields, defaults,
     return FieldsBase
 
 
-def slots_class_sealer(fields, defaults):
+def slots_class_sealer(fields, defaults, tracking=False, gc_untrack=False, key_fields=None):
     """
     This sealer makes a container class that uses ``__slots__`` (it uses :func:`class_sealer` internally).
 
-    The resulting class has a metaclass that forcibly sets ``__slots__`` on subclasses.
+    The resulting class has a metaclass that forcibly sets ``__slots__`` on subclasses. With ``tracking=True`` there's
+    an extra slot for the changes bitmask, and there's one for the cached values of :class:`computed` fields. See
+    :func:`class_sealer` for ``gc_untrack`` and ``key_fields``.
     """
+    slots = fields
+    if tracking:
+        slots = tuple(slots) + ('__fields_changes__',)
+    stored = _split_computed(fields, defaults)[0]
+    if len(stored) != len(fields):
+        slots = tuple(stored) + tuple(slots[len(fields):]) + ('__fields_cache__',)
+
     class __slots_meta__(type):
         def __new__(mcs, name, bases, namespace):
             if "__slots__" not in namespace:
-                namespace["__slots__"] = fields
+                namespace["__slots__"] = slots
             return type.__new__(mcs, name, bases, namespace)
 
     class __slots_base__(_with_metaclass(__slots_meta__, object)):
         __slots__ = ()
+        __init__ = __base__.__dict__['__init__']
 
-        def __init__(self, *args, **kwargs):
-            pass
+    return class_sealer(fields, defaults, base=__slots_base__, tracking=tracking, gc_untrack=gc_untrack,
+                        key_fields=key_fields)
 
-    return class_sealer(fields, defaults, base=__slots_base__)
 
+def _tuple_getnewargs(self):
+    return tuple(self)
 
-def tuple_sealer(fields, defaults):
+
+def tuple_sealer(fields, defaults, gc_untrack=False, key_fields=None):
     """
     This sealer returns an equivalent of a ``namedtuple``.
+
+    With ``gc_untrack=True`` (CPython only) instances that only have atomic values are removed from the cyclic garbage
+    collector (CPython does that for plain tuples, but not for subclasses). If a subclass has a ``__dict__``, assigning
+    a non-atomic attribute adds the instance back.
+
+    With ``key_fields`` the comparisons and ``__hash__`` only use those fields (and only compare instances of the same
+    class), see :func:`class_sealer`.
     """
+    if _split_computed(fields, defaults)[2]:
+        raise TypeError("Computed fields are not supported by tuple_sealer (instances are immutable).")
+    if key_fields is not None:
+        key_fields = _check_key_fields(fields, key_fields)
     baseclass_name = 'FieldsBase_for__{0}'.format('__'.join(fields))
-    global_namespace, local_namespace = make_init_func(
-        fields, defaults, baseclass_name,
+    untrack = None
+    if gc_untrack:
+        from fields.gcuntrack import make_setattr
+        from fields.gcuntrack import make_untracker
+        from fields.gcuntrack import untrack_check
+
+        untrack = make_untracker(fields, check_dict=False)
+    if untrack is None:
+        options = dict(super_call_start='return tuple.__new__(cls, (')
+    else:
+        options = dict(
+            super_call_start='self = tuple.__new__(cls, (',
+            body_end=untrack_check(fields) + '    return self\n',
+        )
+    options.update(
         header_name='__new__',
         header_start='def {func_name}(cls',
         header_end='):\n',
-        super_call_start='return tuple.__new__(cls, (',
-        super_call_end='))\n',
+        super_call_end=',))\n',
         super_call_pass_kwargs=False, set_attributes=False,
     )
-
-    def __getnewargs__(self):
-        return tuple(self)
+    if key_fields is not None:
+        # the comparisons that only use some fields are compiled together with the __new__
+        positions = dict((name, i) for i, name in enumerate(fields))
+        pipeline = SealerPipeline(fields, lambda field, target: '{0}[{1}]'.format(target, positions[field]))
+        global_namespace = pipeline.add_init(defaults, baseclass_name, **options)
+        pipeline.add_comparisons(key_fields)
+        methods = pipeline.compile()
+    else:
+        global_namespace, local_namespace = make_init_func(fields, defaults, baseclass_name, **options)
+        methods = dict(__new__=local_namespace['__new__'])
+    if untrack is not None:
+        global_namespace.update(untrack.namespace)
+    constructor = methods['__new__'] if untrack is None else None
 
     def __repr__(self):
         return "{0}({1})".format(
@@ -245,13 +1460,27 @@ def tuple_sealer(fields, defaults):
             ", ".join(a + "=" + repr(getattr(self, a)) for a in fields)
         )
 
-    return type(baseclass_name, (tuple,), dict(
-        [(name, property(itemgetter(i))) for i, name in enumerate(fields)],
-        __new__=local_namespace['__new__'],
-        __getnewargs__=__getnewargs__,
+    namespace = dict(
+        methods,
+        __getnewargs__=_tuple_getnewargs,
+        __reduce_ex__=_reduce_ex_by_spec,
         __repr__=__repr__,
         __slots__=(),
-    ))
+        __fields__=tuple(fields),
+        row_factory=classmethod(_row_factory),
+        aiter_from_stream=classmethod(_aiter_from_stream),
+        read_csv=classmethod(_read_csv),
+        write_csv=classmethod(_write_csv),
+        from_dict=_GeneratedMethods('from_dict', _make_from_dict_funcs, fields, defaults, constructor),
+        from_dicts=_GeneratedMethods('from_dicts', _make_from_dict_funcs, fields, defaults, constructor),
+        stable_hash=_GeneratedMethods('stable_hash', _make_hash_methods, fields),
+        fingerprint=_GeneratedMethods('fingerprint', _make_hash_methods, fields),
+        to_json=_GeneratedMethods('to_json', _make_json_methods, fields),
+    )
+    if untrack is not None:
+        namespace['__setattr__'] = make_setattr(tuple.__setattr__)
+    namespace.update((name, property(itemgetter(i))) for i, name in enumerate(fields))
+    return type(baseclass_name, (tuple,), namespace)
 
 
 class _SealerWrapper(object):
@@ -273,10 +1502,30 @@ class _SealerWrapper(object):
         return self.func(*args, **dict(self.kwargs, **kwargs))
 
 
+_SHARED_DEFAULT_TYPES = frozenset([int, str, bytes, bool, type(None)])
+
+
+def _set_weak_entry(mapping, key, value, cleanup=None):
+    """
+    Store a weak reference to ``value`` in ``mapping`` (the entry is removed, and ``cleanup`` is called, when ``value``
+    is collected).
+    """
+    from weakref import ref
+
+    def forget(entry):
+        if mapping.get(key) is entry:
+            del mapping[key]
+        if cleanup is not None:
+            cleanup()
+    mapping[key] = ref(value, forget)
+
+
 class _Factory(type):
     """
-    This class makes everything work. It a metaclass for the class that users are going to use. Each new chain
-    rebuilds everything.
+    This class makes everything work. It a metaclass for the class that users are going to use. Each chain step makes
+    a new factory, unless the same step was made before on the same parent (the children are cached in a trie, with
+    weak references so unused branches can be collected; a child keeps its parent alive). Subclassing a factory always
+    seals a new container, so user classes never share a sealed base because a chain happened to be cached.
     """
 
     __required = ()
@@ -286,10 +1535,30 @@ class _Factory(type):
     __full_required = ()
     __sealer = None
     __concrete = None
+    __children = None
+    __parent = None
+
+    def __cached_child(cls, key):
+        children = cls.__children
+        if children is not None:
+            ref = children.get(key)
+            if ref is not None:
+                return ref()
+
+    def __cache_child(cls, key, child):
+        children = cls.__children
+        if children is None:
+            children = cls.__children = {}
+        _set_weak_entry(children, key, child)
+        child.__parent = cls
+        return child
 
     def __getattr__(cls, name):
         if name.startswith("__") and name.endswith("__"):
             return type.__getattribute__(cls, name)
+        child = cls.__cached_child(name)
+        if child is not None:
+            return child
         if name in cls.__required:
             raise TypeError("Field %r is already specified as required." % name)
         if name in cls.__defaults:
@@ -301,24 +1570,35 @@ class _Factory(type):
         if cls.__defaults and cls.__last_field is not None:
             raise TypeError("Can't add required fields after fields with defaults.")
 
-        return _Factory(
+        return cls.__cache_child(name, _Factory(
             required=cls.__full_required,
             defaults=cls.__defaults,
             last_field=name,
             sealer=cls.__sealer,
-        )
+        ))
 
     def __getitem__(cls, default):
         if cls.__last_field is None:
             raise TypeError("Can't set default %r. There's no previous field." % default)
+        try:
+            key = type(default), default
+            child = cls.__cached_child(key)
+        except TypeError:  # unhashable default
+            key = child = None
+        # equal defaults only share the factory if they can't be told apart (eg: 0.0 and -0.0 can)
+        if child is not None and (type(default) in _SHARED_DEFAULT_TYPES or child.__defaults[cls.__last_field] is default):
+            return child
 
         new_defaults = OrderedDict(cls.__defaults)
         new_defaults[cls.__last_field] = default
-        return _Factory(
+        child = _Factory(
             required=cls.__required,
             defaults=new_defaults,
             sealer=cls.__sealer,
         )
+        if key is None:
+            return child
+        return cls.__cache_child(key, child)
 
     def __new__(mcs, name="__blank__", bases=(), namespace=None, last_field=None, required=(), defaults=(),
                 sealer=_SealerWrapper(class_sealer)):
@@ -358,9 +1638,13 @@ class _Factory(type):
                             ', '.join(repr(name) for name in names)
                         ))
 
-            return type(name, tuple(
-                    ~k if isinstance(k, _Factory) else k for k in bases
+            cls = type(name, tuple(
+                    k.__seal() if isinstance(k, _Factory) else k for k in bases
             ), {} if namespace is None else namespace)
+            for klass in cls.__mro__:
+                if klass is cls or '__fields__' in klass.__dict__:
+                    _claim_generated_code(klass, cls)
+            return cls
 
     def __init__(cls, *args, **kwargs):
         pass
@@ -370,14 +1654,24 @@ class _Factory(type):
 
     def __invert__(cls):
         if cls.__concrete is None:
-            if not cls.__all_fields:
-                raise TypeError("You're trying to use an empty Fields factory !")
-            if cls.__defaults and cls.__last_field is not None:
-                raise TypeError("Can't add required fields after fields with defaults.")
-
-            cls.__concrete = cls.__sealer(cls.__all_fields, cls.__defaults)
+            cls.__concrete = cls.__seal()
         return cls.__concrete
 
+    def __seal(cls):
+        if not cls.__all_fields:
+            raise TypeError("You're trying to use an empty Fields factory !")
+        if cls.__defaults and cls.__last_field is not None:
+            raise TypeError("Can't add required fields after fields with defaults.")
+
+        concrete = cls.__sealer(cls.__all_fields, cls.__defaults)
+        try:
+            concrete.__fields_spec__ = (
+                cls.__sealer.func, cls.__sealer.kwargs, tuple(cls.__all_fields), tuple(OrderedDict(cls.__defaults).items())
+            )
+        except (TypeError, AttributeError):
+            pass
+        return concrete
+
 
 class Namespace(object):
     """
@@ -395,6 +1689,48 @@ class Namespace(object):
         return self.__dict__ == other.__dict__
 
 
+def field_types(cls, types=None):
+    """
+    Return the declared types for the fields of a sealed class.
+
+    Types are taken from the class annotations (looked up through the whole MRO) and can be overridden with ``types``.
+
+    Args:
+        cls: A class that has a sealed container as a base (or a factory, eg: ``Fields.a.b``).
+        types (dict): Optional mapping of field names to types. Takes precedence over annotations.
+    Return:
+        An ``OrderedDict`` with the types, in field order.
+
+        Example:
+
+        .. sourcecode:: pycon
+
+            >>> from fields import Fields
+            >>> class Point(Fields.x.y):
+            ...     pass
+            ...
+            >>> field_types(Point, {'x': float, 'y': float})
+            OrderedDict(...('x', <... 'float'>), ('y', <... 'float'>)...)
+    """
+    if isinstance(cls, _Factory):
+        cls = ~cls
+    try:
+        fields = cls.__fields__
+    except AttributeError:
+        raise TypeError("%r is not a sealed class (it doesn't have a __fields__ attribute)." % cls)
+    declared = {}
+    for klass in reversed(cls.__mro__):
+        declared.update(getattr(klass, '__annotations__', None) or ())
+    if types:
+        declared.update(types)
+    result = OrderedDict()
+    for name in fields:
+        if name not in declared:
+            raise TypeError("Field %r of %r doesn't have a declared type." % (name, cls))
+        result[name] = declared[name]
+    return result
+
+
 def factory(sealer, **sealer_options):
     """
     Create a factory that will produce a class using the given ``sealer``.
@@ -435,16 +1771,43 @@ def factory(sealer, **sealer_options):
     return _Factory(sealer=_SealerWrapper(sealer, **sealer_options))
 
 
-Fields = _Factory()
-ConvertibleFields = factory(class_sealer, convertible=True)
-SlotsFields = factory(slots_class_sealer)
-BareFields = factory(class_sealer, comparable=False, printable=False)
-InheritableFields = factory(class_sealer, base=object, pass_kwargs=True)
-
-Tuple = factory(tuple_sealer)
-
-PrintableMixin = factory(class_sealer, initializer=False, base=object, comparable=False)
-ComparableMixin = factory(class_sealer, initializer=False, base=object, printable=False)
-ConvertibleMixin = factory(
-    class_sealer, initializer=False, base=object, printable=False, comparable=False, convertible=True
-)
+_FACTORIES = {
+    'Fields': (class_sealer, {}),
+    'ConvertibleFields': (class_sealer, dict(convertible=True)),
+    'SlotsFields': (slots_class_sealer, {}),
+    'BareFields': (class_sealer, dict(comparable=False, printable=False)),
+    'InheritableFields': (class_sealer, dict(base=object, pass_kwargs=True, flatten_init=True)),
+    'Tuple': (tuple_sealer, {}),
+    'PrintableMixin': (class_sealer, dict(initializer=False, base=object, comparable=False)),
+    'ComparableMixin': (class_sealer, dict(initializer=False, base=object, printable=False)),
+    'ConvertibleMixin': (
+        class_sealer, dict(initializer=False, base=object, printable=False, comparable=False, convertible=True)
+    ),
+}
+# things that live in submodules (imported on first access)
+_SUBMODULE_NAMES = {
+    'StructFields': 'fields.structs',
+    'ctypes_sealer': 'fields.structs',
+    'ShapedNamespace': 'fields.namespaces',
+}
+
+
+def __getattr__(name):
+    """
+    Make the builtin factories (``Fields``, ``Tuple`` etc) and import the things from submodules (``StructFields``
+    etc) on first access (PEP 562, Python 3.7+).
+    """
+    if name in _SUBMODULE_NAMES:
+        module = _SUBMODULE_NAMES[name]
+        __import__(module)
+        return globals().setdefault(name, getattr(sys.modules[module], name))
+    try:
+        sealer, options = _FACTORIES[name]
+    except KeyError:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    return globals().setdefault(name, factory(sealer, **options))
+
+
+if sys.version_info[:2] < (3, 7):
+    for _name in chain(_FACTORIES, _SUBMODULE_NAMES):
+        __getattr__(_name)
@@ -0,0 +1,154 @@
+"""
+NumPy interop for sealed classes. Requires ``numpy`` (it's not a dependency of ``fields``).
+
+The field types need to be declared, either via annotations on the class or via the ``types`` argument (see
+:func:`fields.field_types`).
+"""
+from operator import attrgetter
+
+import numpy
+
+from fields import field_types
+from fields.views import make_view_class
+
+__all__ = (
+    'ArrayView',
+    'dtype_for',
+    'from_array',
+    'to_array',
+    'view_class',
+)
+
+_SCALAR_TYPES = {
+    bool: '?',
+    int: 'i8',
+    float: 'f8',
+    complex: 'c16',
+}
+
+
+def dtype_for(cls, types=None):
+    """
+    Make a structured dtype with the fields of ``cls``.
+
+    Args:
+        cls: A sealed class.
+        types (dict): Optional mapping of field names to types (python types like ``int`` or ``float``, or anything
+            ``numpy.dtype`` accepts). Takes precedence over the annotations of ``cls``.
+    Return:
+        A ``numpy.dtype``.
+    """
+    descr = []
+    for name, kind in field_types(cls, types).items():
+        dtype = numpy.dtype(_SCALAR_TYPES.get(kind, kind))
+        if dtype.itemsize == 0:
+            raise TypeError("Field %r has a flexible type (%s). Use a sized type instead (eg: 'U16' or 'S16')." % (
+                name, dtype
+            ))
+        descr.append((name, dtype))
+    return numpy.dtype(descr)
+
+
+def to_array(cls, records, types=None):
+    """
+    Convert an iterable of ``cls`` instances to a structured array (in bulk).
+    """
+    dtype = dtype_for(cls, types)
+    if issubclass(cls, tuple):
+        rows = list(records)
+    else:
+        fields = cls.__fields__
+        if len(fields) == 1:
+            name, = fields
+            rows = [(getattr(record, name),) for record in records]
+        else:
+            getter = attrgetter(*fields)
+            rows = [getter(record) for record in records]
+    return numpy.array(rows, dtype=dtype)
+
+
+def from_array(cls, array):
+    """
+    Convert a structured array (or an :class:`ArrayView`) back to a list of ``cls`` instances.
+    """
+    if isinstance(array, ArrayView):
+        array = array.array
+    return [cls(*row) for row in array[list(cls.__fields__)].tolist()]
+
+
+def _row_value(view, name):
+    return view._row[name].item()
+
+
+def view_class(cls):
+    """
+    Return a class for row views that has the same attributes as ``cls``. The views wrap a ``numpy.void`` (a row of a
+    structured array) so reading or assigning attributes goes straight to the array's memory.
+
+    The view class is cached on ``cls`` (the view refers to ``cls``, so a cache keyed by ``cls`` would keep it alive).
+    """
+    view = cls.__dict__.get('__fields_array_view__')
+    if view is None:
+        def make_property(name):
+            def getter(self):
+                return self._row[name]
+
+            def setter(self, value):
+                self._row[name] = value
+
+            return property(getter, setter)
+
+        def __init__(self, row):
+            self._row = row
+
+        namespace = dict(
+            [(name, make_property(name)) for name in cls.__fields__],
+            __slots__=('_row',),
+            __init__=__init__,
+        )
+        view = make_view_class(cls, '{0}View'.format(cls.__name__), namespace, _row_value)
+        cls.__fields_array_view__ = view
+    return view
+
+
+class ArrayView(object):
+    """
+    A zero-copy sequence over a structured array. Items are row views (see :func:`view_class`) and slices are
+    :class:`ArrayView` instances over the sliced array.
+
+    Example:
+
+    .. sourcecode:: pycon
+
+        >>> from fields import Fields
+        >>> class Point(Fields.x.y):
+        ...     pass
+        ...
+        >>> types = {'x': float, 'y': float}
+        >>> points = ArrayView(Point, to_array(Point, [Point(1, 2), Point(3, 4)], types))
+        >>> points[1]
+        Point(x=3.0, y=4.0)
+        >>> points[1].x = 5
+        >>> points.array['x']
+        array([1., 5.])
+    """
+    def __init__(self, cls, array):
+        self.cls = cls
+        self.array = array
+        self.view = view_class(cls)
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ArrayView(self.cls, self.array[index])
+        return self.view(self.array[index])
+
+    def __iter__(self):
+        view = self.view
+        for row in self.array:
+            yield view(row)
+
+    def __repr__(self):
+        return "ArrayView({0}, {1!r})".format(self.cls.__name__, self.array)
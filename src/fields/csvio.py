@@ -0,0 +1,131 @@
+"""
+Streaming CSV reading and writing for sealed classes.
+
+The header is mapped to the fields once and the rows are converted in chunks by a generated function (no dict per
+row, like with ``csv.DictReader``). The containers made by the builtin sealers have ``Cls.read_csv`` and
+``Cls.write_csv`` that use these functions.
+
+Example:
+
+.. sourcecode:: pycon
+
+    >>> import io
+    >>> from fields import Tuple
+    >>> class Point(Tuple.x.y):
+    ...     pass
+    ...
+    >>> data = io.StringIO()
+    >>> write_csv(Point, data, [Point(1, 2), Point(3, 4)])
+    >>> print(data.getvalue().replace('\\r', ''))
+    x,y
+    1,2
+    3,4
+    <BLANKLINE>
+    >>> _ = data.seek(0)
+    >>> list(read_csv(Point, data, converters={'x': int, 'y': int}))
+    [Point(x=1, y=2), Point(x=3, y=4)]
+"""
+import csv
+from itertools import islice
+from operator import attrgetter
+
+from fields import _exec_code
+
+__all__ = (
+    'make_rows_converter',
+    'read_csv',
+    'write_csv',
+)
+
+
+def make_rows_converter(cls, columns, converters=None):
+    """
+    Generate a function that takes a list of rows (lists of strings, in ``columns`` order) and returns a list of
+    instances of ``cls``. Columns that don't match a field are ignored, fields that don't have a column get their
+    default value. Empty rows are skipped.
+
+    Args:
+        cls: The sealed class.
+        columns: The column names.
+        converters (dict): Optional callables (by field name) that convert the strings (eg: ``int``).
+    """
+    converters = converters or {}
+    unknown = [field for field in converters if field not in cls.__fields__]
+    if unknown:
+        raise TypeError("Converters for unknown fields %r." % (unknown,))
+    positions = {}
+    for position, column in enumerate(columns):
+        positions.setdefault(column, position)
+    global_namespace = dict(__cls=cls)
+    args = []
+    positional = True
+    for i, field in enumerate(cls.__fields__):
+        if field in positions:
+            value = 'row[{0}]'.format(positions[field])
+            if field in converters:
+                global_namespace['__convert{0}'.format(i)] = converters[field]
+                value = '__convert{0}({1})'.format(i, value)
+            args.append(value if positional else '{0}={1}'.format(field, value))
+        else:
+            positional = False
+    func_name = '__fields_csv_rows_for__{0}__'.format('__'.join(cls.__fields__))
+    local_namespace = {}
+    _exec_code('def {0}(rows):\n    return [__cls({1}) for row in rows if row]\n'.format(func_name, ', '.join(args)),
+               'csv-rows', global_namespace, local_namespace)
+    return local_namespace[func_name]
+
+
+def read_csv(cls, fileobj, header=True, chunksize=1000, converters=None, **fmtparams):
+    """
+    Read instances of ``cls`` from a CSV file. Returns a generator.
+
+    Args:
+        cls: The sealed class.
+        fileobj: A file opened in text mode (with ``newline=''``), or any iterable of lines.
+        header: ``True`` if the first row has the column names (matched with the fields by name), ``False`` if the
+            columns are the fields (in order), or a list with the column names.
+        chunksize (int): How many rows to convert at once.
+        converters (dict): Optional callables (by field name) that convert the strings (eg: ``int``).
+        fmtparams: Passed to ``csv.reader`` (eg: ``delimiter``).
+    """
+    reader = csv.reader(fileobj, **fmtparams)
+    if header is True:
+        columns = next(reader, None)
+        if columns is None:
+            return
+    elif header is False:
+        columns = cls.__fields__
+    else:
+        columns = header
+    convert = make_rows_converter(cls, columns, converters)
+    while True:
+        rows = list(islice(reader, chunksize))
+        if not rows:
+            break
+        for record in convert(rows):
+            yield record
+
+
+def write_csv(cls, fileobj, records, header=True, **fmtparams):
+    """
+    Write ``records`` (instances of ``cls``) to a CSV file, one row per record with the fields in order.
+
+    Args:
+        cls: The sealed class.
+        fileobj: A file opened in text mode (with ``newline=''``).
+        records: An iterable of records.
+        header (bool): Write a first row with the field names.
+        fmtparams: Passed to ``csv.writer`` (eg: ``delimiter``).
+    """
+    writer = csv.writer(fileobj, **fmtparams)
+    fields = cls.__fields__
+    if header:
+        writer.writerow(fields)
+    if issubclass(cls, tuple) and getattr(cls.__new__, '__code__', None) is not None and \
+            cls.__new__.__code__.co_argcount == len(fields) + 1:
+        writer.writerows(records)
+    elif len(fields) == 1:
+        name, = fields
+        writer.writerows((getattr(record, name),) for record in records)
+    else:
+        writer.writerows(map(attrgetter(*fields), records))
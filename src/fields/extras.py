@@ -1,5 +1,6 @@
 import re
 
+from fields import SealerPipeline
 from fields import __base__
 from fields import _Factory
 from fields import _SealerWrapper
@@ -9,41 +10,51 @@ class ValidationError(Exception):
     pass
 
 
+def _positional_error(position, value, validator):
+    return ValidationError("Positional argument %s failed validation. %r doesn't match regex %r" % (
+        position, value, validator.pattern
+    ))
+
+
+def _keyword_error(key, value, validator):
+    return ValidationError("Keyword argument %r failed validation. %r doesn't match regex %r" % (
+        key, value, validator.pattern
+    ))
+
+
 def regex_validation_sealer(fields, defaults, RegexType=type(re.compile(""))):
     """
-    Example sealer that just does regex-based validation.
+    Example sealer that just does regex-based validation. The ``__init__`` is generated with :class:`fields.SealerPipeline`
+    (the checks for each field are unrolled).
     """
     required = set(fields) - set(defaults)
     if required:
         raise TypeError(
             "regex_validation_sealer doesn't support required arguments. Fields that need fixing: %s" % required)
 
-    klass = None
     kwarg_validators = dict(
         (key, val if isinstance(val, RegexType) else re.compile(val)) for key, val in defaults.items()
     )
-    arg_validators = list(
-        kwarg_validators[key] for key in fields
+    global_namespace = dict(
+        __positional_error=_positional_error,
+        __keyword_error=_keyword_error,
     )
-
-    def __init__(self, *args, **kwargs):
-        for pos, (value, validator) in enumerate(zip(args, arg_validators)):
-            if not validator.match(value):
-                raise ValidationError("Positional argument %s failed validation. %r doesn't match regex %r" % (
-                    pos, value, validator.pattern
-                ))
-        for key, value in kwargs.items():
-            if key in kwarg_validators:
-                validator = kwarg_validators[key]
-                if not validator.match(value):
-                    raise ValidationError("Keyword argument %r failed validation. %r doesn't match regex %r" % (
-                        key, value, validator.pattern
-                    ))
-        super(klass, self).__init__(*args, **kwargs)
-
-    klass = type("RegexValidateBase", (__base__,), dict(
-        __init__=__init__,
-    ))
+    parts = ['def __init__(self, *args, **kwargs):\n'
+             '    count = len(args)\n']
+    for position, key in enumerate(fields):
+        global_namespace['__validator{0}'.format(position)] = kwarg_validators[key]
+        parts.append(
+            '    if count > {0} and not __validator{0}.match(args[{0}]):\n'
+            '        raise __positional_error({0}, args[{0}], __validator{0})\n'
+            '    if {1!r} in kwargs and not __validator{0}.match(kwargs[{1!r}]):\n'
+            '        raise __keyword_error({1!r}, kwargs[{1!r}], __validator{0})\n'.format(position, key)
+        )
+    parts.append('    super(__fields_class, self).__init__(*args, **kwargs)\n')
+
+    pipeline = SealerPipeline(fields)
+    global_namespace = pipeline.add(''.join(parts), ['__init__'], global_namespace)
+    klass = type("RegexValidateBase", (__base__,), pipeline.compile())
+    global_namespace['__fields_class'] = klass
     return klass
 
 
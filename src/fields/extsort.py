@@ -0,0 +1,192 @@
+"""
+External merge sort for streams of records that don't fit in memory (Python 3.5+).
+
+The input is consumed in bounded chunks, each chunk is sorted and written to a temporary file (a "run") and the runs
+are merged back lazily with ``heapq.merge``. Records of sealed classes are stored compactly: only the field values
+are pickled (in batches), not the instances, and the records are rebuilt without calling the constructor.
+
+Example:
+
+.. sourcecode:: pycon
+
+    >>> from fields import Tuple
+    >>> class Event(Tuple.user.time):
+    ...     pass
+    ...
+    >>> events = (Event(i % 3, -i) for i in range(10))
+    >>> [event.time for event in external_sort(events, fields=['time'], max_records=4)][:3]
+    [-9, -8, -7]
+"""
+import pickle
+import sys
+import tempfile
+from functools import partial
+from heapq import merge
+from itertools import islice
+from operator import attrgetter
+from types import MemberDescriptorType
+
+__all__ = (
+    'external_sort',
+)
+
+_BATCH_SIZE = 1000
+
+
+def _estimate_size(record):
+    size = sys.getsizeof(record) + 8  # the pointer in the chunk list
+    fields = getattr(type(record), '__fields__', None)
+    if fields:
+        size += sum(sys.getsizeof(getattr(record, field)) for field in fields)
+    if hasattr(record, '__dict__'):
+        size += sys.getsizeof(record.__dict__)
+    return size
+
+
+def _make_codec(cls):
+    """
+    Return a function that converts a record of ``cls`` to a row (a tuple of field values), a function that converts
+    a batch of rows back to records and a function that checks if a record can be converted (all its state is in the
+    fields of the sealed bases), or ``None`` if all the records can. The records are rebuilt without calling the
+    constructor (like unpickling does). Returns ``None`` if ``cls`` isn't a sealed class or has state outside the
+    fields (the records are pickled as they are).
+    """
+    fields = []
+    for klass in reversed(cls.__mro__):
+        fields.extend(field for field in klass.__dict__.get('__fields__', ()) if field not in fields)
+    if not fields:
+        return None
+    fields = tuple(fields)
+    if issubclass(cls, tuple):
+        if cls.__dictoffset__:
+            def check(record):
+                return not getattr(record, '__dict__', None)
+        else:
+            check = None
+        return tuple, partial(map, partial(tuple.__new__, cls)), check
+    slots = set()
+    for klass in cls.__mro__:
+        slots.update([klass.__dict__['__slots__']] if isinstance(klass.__dict__.get('__slots__'), str) else
+                     klass.__dict__.get('__slots__', ()))
+    slotted = set(field for field in fields if isinstance(getattr(cls, field, None), MemberDescriptorType))
+    if slots - slotted - {'__dict__', '__weakref__'}:
+        return None
+    in_dict = set(fields) - slotted
+
+    def check(record):
+        state = getattr(record, '__dict__', None)
+        return state.keys() == in_dict if state is not None else not in_dict
+
+    new = cls.__new__
+    if slotted:
+        setattr_ = object.__setattr__
+
+        def decode(rows):
+            for row in rows:
+                record = new(cls)
+                for name, value in zip(fields, row):
+                    setattr_(record, name, value)
+                yield record
+    else:
+        def decode(rows):
+            for row in rows:
+                record = new(cls)
+                record.__dict__.update(zip(fields, row))
+                yield record
+    getter = attrgetter(*fields)
+    if len(fields) == 1:
+        def encode(record):
+            return getter(record),
+    else:
+        encode = getter
+    return encode, decode, check
+
+
+def _write_run(chunk, directory):
+    cls = type(chunk[0])
+    for record in chunk:
+        if type(record) is not cls:
+            cls = None
+            break
+    codec = _make_codec(cls) if cls is not None else None
+    if codec is not None and (codec[2] is None or all(map(codec[2], chunk))):
+        encode, decode, _ = codec
+    else:
+        encode = decode = None
+    run = tempfile.TemporaryFile(dir=directory)
+    try:
+        dump = pickle.Pickler(run, pickle.HIGHEST_PROTOCOL).dump
+        for start in range(0, len(chunk), _BATCH_SIZE):
+            batch = chunk[start:start + _BATCH_SIZE]
+            dump(list(map(encode, batch)) if encode else batch)
+        run.seek(0)
+    except BaseException:
+        run.close()
+        raise
+    return run, decode
+
+
+def _read_run(run, decode):
+    try:
+        load = pickle.Unpickler(run).load
+        while True:
+            try:
+                batch = load()
+            except EOFError:
+                break
+            yield from batch if decode is None else decode(batch)
+    finally:
+        run.close()
+
+
+def external_sort(records, key=None, fields=None, reverse=False, max_records=None, max_memory=64 * 1024 * 1024,
+                  tmpdir=None):
+    """
+    Sort ``records`` (any iterable) using temporary files for the data that doesn't fit in memory. Returns an iterator.
+    The sort is stable.
+
+    Args:
+        records: Iterable of records (instances of sealed classes, or anything picklable).
+        key: Optional key function (like for ``sorted``).
+        fields: Optional list of field names to sort by (instead of ``key``).
+        reverse (bool): Sort in descending order.
+        max_records (int): How many records to sort in memory at once. Default is based on ``max_memory``.
+        max_memory (int): Approximate memory (in bytes) for the records sorted in memory at once (the size of a record
+            is estimated from the first one). Ignored if ``max_records`` is given.
+        tmpdir (str): Directory for the temporary files (default is the system's temporary directory).
+    """
+    if fields is not None:
+        if key is not None:
+            raise TypeError("Can't use both key and fields.")
+        key = attrgetter(*fields)
+    iterator = iter(records)
+    if max_records is None:
+        first = list(islice(iterator, 1))
+        if not first:
+            return iter(())
+        max_records = max(1, max_memory // _estimate_size(first[0]))
+        chunk = first + list(islice(iterator, max_records - 1))
+    else:
+        if max_records < 1:
+            raise ValueError("max_records must be at least 1 (got %r)." % max_records)
+        chunk = list(islice(iterator, max_records))
+    chunk.sort(key=key, reverse=reverse)
+    next_chunk = list(islice(iterator, max_records))
+    if not next_chunk:
+        return iter(chunk)
+    return _merge_runs(chunk, next_chunk, iterator, key, reverse, max_records, tmpdir)
+
+
+def _merge_runs(chunk, next_chunk, iterator, key, reverse, max_records, tmpdir):
+    runs = []
+    try:
+        runs.append(_write_run(chunk, tmpdir))
+        del chunk
+        while next_chunk:
+            next_chunk.sort(key=key, reverse=reverse)
+            runs.append(_write_run(next_chunk, tmpdir))
+            next_chunk = list(islice(iterator, max_records))
+        yield from merge(*[_read_run(run, decode) for run, decode in runs], key=key, reverse=reverse)
+    finally:
+        for run, _ in runs:
+            run.close()
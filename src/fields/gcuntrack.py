@@ -0,0 +1,128 @@
+"""
+Support for the ``gc_untrack`` option of the builtin sealers (CPython only): instances that only hold atomic values
+(``None``, numbers, strings, bytes) can't be part of a reference cycle, so they are removed from the cyclic garbage
+collector (``PyObject_GC_UnTrack``, called via ``ctypes``) and added back when a non-atomic value is assigned.
+
+The sealers use :func:`make_untracker` and :func:`untrack_check` for the generated ``__init__``/``__new__`` and
+:func:`make_setattr` for the ``__setattr__``.
+"""
+import gc
+
+__all__ = (
+    'ATOMIC_TYPES',
+    'make_setattr',
+    'make_untracker',
+    'untrack_check',
+)
+
+ATOMIC_TYPES = frozenset([type(None), bool, int, float, complex, type(b''), type(u''), type(2 ** 64)])
+_gc_api = []
+
+
+def _get_gc_api():
+    """
+    Return the ``PyObject_GC_UnTrack`` and ``PyObject_GC_Track`` C functions (via ``ctypes``), or ``None`` if they're
+    not available (eg: not CPython).
+    """
+    if not _gc_api:
+        try:
+            import ctypes
+
+            prototype = ctypes.PYFUNCTYPE(None, ctypes.py_object)
+            _gc_api.append((
+                prototype(('PyObject_GC_UnTrack', ctypes.pythonapi)),
+                prototype(('PyObject_GC_Track', ctypes.pythonapi)),
+            ))
+        except (ImportError, AttributeError):
+            _gc_api.append(None)
+    return _gc_api[0]
+
+
+def _other_attributes(cls, fields, check_dict=True):
+    """
+    Return the names of the instance attributes of ``cls`` that are not in ``fields`` (slots from the whole MRO, and
+    ``"__dict__"`` if the instances have a dict and ``check_dict`` is true).
+    """
+    names = []
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get('__slots__', ())
+        for name in (slots,) if isinstance(slots, str) else slots:
+            if name.startswith('__') and not name.endswith('__'):
+                name = '_{0}{1}'.format(klass.__name__.lstrip('_'), name)
+            if name not in fields and name not in names and name not in ('__weakref__', '__dict__'):
+                names.append(name)
+    if check_dict and getattr(cls, '__dictoffset__', 0):
+        names.append('__dict__')
+    return tuple(names)
+
+
+def make_untracker(fields, check_dict=True):
+    """
+    Make a function that removes an instance from the cyclic GC if all its other attributes (the ones not in
+    ``fields``, that were already checked by the caller) have atomic values (they can't be part of a reference cycle).
+    The instance dict is not checked if ``check_dict`` is false (eg: it's always empty in ``__new__``).
+
+    Return:
+        The function (its ``namespace`` attribute has the globals needed by the code from :func:`untrack_check`), or
+        ``None`` if the GC functions are not available.
+    """
+    api = _get_gc_api()
+    if api is None:
+        return None
+    untrack, _ = api
+    other_attributes = {}
+    plain_types = set()
+
+    def __fields_untrack(obj):
+        cls = type(obj)
+        names = other_attributes.get(cls)
+        if names is None:
+            names = other_attributes[cls] = _other_attributes(cls, fields, check_dict)
+            if not names:
+                plain_types.add(cls)
+        for name in names:
+            if name == '__dict__':
+                for value in obj.__dict__.values():
+                    if type(value) not in ATOMIC_TYPES:
+                        return
+            elif type(getattr(obj, name, None)) not in ATOMIC_TYPES:
+                return
+        untrack(obj)
+
+    __fields_untrack.namespace = dict(
+        __fields_type=type,
+        __fields_atomic=ATOMIC_TYPES,
+        __fields_untrack=__fields_untrack,
+        __fields_plain_types=plain_types,
+        __fields_c_untrack=untrack,
+    )
+    return __fields_untrack
+
+
+def make_setattr(next_setattr):
+    """
+    Make a ``__setattr__`` that adds the instance back to the cyclic GC when a non-atomic value is assigned.
+    """
+    _, track = _get_gc_api()
+    is_tracked = gc.is_tracked
+
+    def __setattr__(self, name, value):
+        next_setattr(self, name, value)
+        if type(value) not in ATOMIC_TYPES and not is_tracked(self):
+            track(self)
+
+    return __setattr__
+
+
+def untrack_check(fields):
+    """
+    Return the generated code that untracks ``self`` when the values of ``fields`` are atomic (it needs the globals
+    from the ``namespace`` of the untrack function). Classes that don't have other attributes skip the check.
+    """
+    return (
+        '    if {0}:\n'
+        '        if __fields_type(self) in __fields_plain_types:\n'
+        '            __fields_c_untrack(self)\n'
+        '        else:\n'
+        '            __fields_untrack(self)\n'
+    ).format(' and '.join('__fields_type({0}) in __fields_atomic'.format(field) for field in fields))
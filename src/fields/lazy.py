@@ -0,0 +1,160 @@
+"""
+Lazily decoded records: the fields are encoded separately (in a blob with an offset table) and a view over the blob
+only decodes the fields that are accessed.
+
+Blob format (little-endian): the number of fields (2 bytes), the end offsets of the encoded fields (4 bytes each,
+relative to the end of the header) and the encoded fields (JSON by default).
+
+Example:
+
+.. sourcecode:: pycon
+
+    >>> from fields import Fields
+    >>> class Event(Fields.user.kind.payload):
+    ...     pass
+    ...
+    >>> layout = LazyLayout.of(Event)
+    >>> blob = layout.pack(Event('alice', 'click', {'x': [1, 2, 3]}))
+    >>> event = layout.view(blob)
+    >>> event.kind  # only this field is decoded
+    'click'
+    >>> event.as_record()
+    Event(user='alice', kind='click', payload={'x': [1, 2, 3]})
+"""
+import json
+import struct
+
+from fields.views import make_view_class
+
+__all__ = (
+    'LazyLayout',
+)
+
+_COUNT = struct.Struct('<H')
+_OFFSET = struct.Struct('<I')
+_BOUNDS = struct.Struct('<II')
+
+
+def _json_dumps(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _make_json_loads():
+    scan_once = json.JSONDecoder().scan_once
+
+    def loads(data):
+        # the encoded values are exact (and compact), so there's no need for json.loads' whitespace and trailing checks
+        try:
+            return scan_once(data.decode('utf-8'), 0)[0]
+        except StopIteration:
+            raise ValueError("Invalid JSON value: %r" % data)
+    return loads
+
+
+class _LazyField(object):
+    """
+    Non-data descriptor: the decoded value is stored in the instance ``__dict__`` (under the same name), so it's only
+    decoded once and the next reads don't go through the descriptor.
+    """
+    def __init__(self, name, index, header_size, loads):
+        self.name = name
+        self.index = index
+        self.header_size = header_size
+        self.loads = loads
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        blob = instance._blob
+        index = self.index
+        if index:
+            start, end = _BOUNDS.unpack_from(blob, _COUNT.size + (index - 1) * _OFFSET.size)
+        else:
+            start, end = 0, _OFFSET.unpack_from(blob, _COUNT.size)[0]
+        header_size = self.header_size
+        value = instance.__dict__[self.name] = self.loads(bytes(blob[header_size + start:header_size + end]))
+        return value
+
+
+class LazyLayout(object):
+    """
+    Encoding of a sealed class as blobs that can be decoded field by field, and the view class for these blobs: it has
+    the same attributes as the sealed class and each field is decoded (and cached) on first access.
+
+    Args:
+        cls: The sealed class.
+        dumps: Callable that encodes a field value to ``bytes`` (default: compact JSON).
+        loads: Callable that decodes a field value (default: ``json.loads``).
+    """
+    def __init__(self, cls, dumps=None, loads=None):
+        self.cls = cls
+        self.fields = cls.__fields__
+        if len(self.fields) > 0xFFFF:
+            raise TypeError("Too many fields (%s)." % len(self.fields))
+        self.dumps = dumps or _json_dumps
+        self.loads = loads or _make_json_loads()
+        self.header = struct.Struct('<H%sI' % len(self.fields))
+        self.view = self._make_view()
+
+    @classmethod
+    def of(cls, record_class):
+        """
+        Return a cached layout with the default (JSON) encoding. The layout is cached on ``record_class`` (it refers to
+        the class, so a cache keyed by the class would keep it alive).
+        """
+        layout = record_class.__dict__.get('__fields_lazy_layout__')
+        if layout is None:
+            layout = cls(record_class)
+            record_class.__fields_lazy_layout__ = layout
+        return layout
+
+    def pack(self, record):
+        """
+        Return the blob for ``record``.
+        """
+        dumps = self.dumps
+        encoded = [dumps(getattr(record, name)) for name in self.fields]
+        offsets = []
+        end = 0
+        for data in encoded:
+            end += len(data)
+            offsets.append(end)
+        return self.header.pack(len(encoded), *offsets) + b''.join(encoded)
+
+    def unpack(self, blob):
+        """
+        Decode all the fields in ``blob`` and return a record.
+        """
+        self._check_count(_COUNT.unpack_from(blob)[0])
+        offsets = self.header.unpack_from(blob)[1:]
+        loads = self.loads
+        start = self.header.size
+        args = []
+        for offset in offsets:
+            end = self.header.size + offset
+            args.append(loads(bytes(blob[start:end])))
+            start = end
+        return self.cls(*args)
+
+    def _check_count(self, count):
+        if count != len(self.fields):
+            raise ValueError("Blob has %s fields, expected %s (the fields of %r)." % (count, len(self.fields), self.cls))
+
+    def _make_view(self):
+        fields = self.fields
+        unpack_count = _COUNT.unpack_from
+        check_count = self._check_count
+        header_size = self.header.size
+
+        def __init__(self, blob):
+            count, = unpack_count(blob)
+            if count != len(fields):
+                check_count(count)
+            self._blob = blob
+
+        namespace = dict(
+            ((name, _LazyField(name, index, header_size, self.loads)) for index, name in enumerate(fields)),
+            __slots__=('_blob', '__dict__'),
+            __init__=__init__,
+        )
+        return make_view_class(self.cls, 'Lazy{0}'.format(self.cls.__name__), namespace)
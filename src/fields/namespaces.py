@@ -0,0 +1,120 @@
+"""
+Namespaces that share a class with ``__slots__`` per set of attribute names (see :class:`ShapedNamespace`).
+"""
+from fields import Namespace
+from fields import _claim_generated_code
+from fields import _forget_sources
+from fields import _is_field_name
+from fields import _LRUCache
+from fields import _set_weak_entry
+from fields import _specialize_mixin
+from fields import slots_class_sealer
+
+__all__ = (
+    'ShapedNamespace',
+)
+
+_namespace_shapes = _LRUCache(256)
+_namespace_shape_refs = {}
+
+
+def _unpickle_namespace(cls, attributes):
+    return cls(**attributes)
+
+
+def _namespace_init(*args, **kwargs):
+    args[0].__dict__.update(kwargs)
+
+
+def _namespace_eq(self, other):
+    if isinstance(other, (Namespace, ShapedNamespace)):
+        return self.__dict__ == other.__dict__
+    return NotImplemented
+
+
+def _namespace_ne(self, other):
+    result = _namespace_eq(self, other)
+    return result if result is NotImplemented else not result
+
+
+class ShapedNamespace(object):
+    """
+    Like :class:`fields.Namespace` but the instances with the same attribute names (the same "shape") share a class
+    with ``__slots__`` (sealed with :func:`fields.slots_class_sealer`), so they don't have a ``__dict__`` each and
+    ``__init__``, ``__eq__`` and ``__repr__`` are generated for the shape. New attributes can't be added after
+    construction.
+
+    The shape classes are weakly referenced (they live as long as they have instances) and the last 256 used ones are
+    kept in a LRU. The :mod:`linecache` entries of the generated code are removed when a shape class is collected.
+
+    Attribute names that can't be fields (not identifiers, keywords, names that start with ``__`` or that the generated
+    code uses, like ``self`` or ``super``) are stored in a ``__dict__`` instead (like :class:`fields.Namespace` does).
+
+    Example:
+
+    .. sourcecode:: pycon
+
+        >>> from fields import Namespace
+        >>> from fields import ShapedNamespace
+        >>> ShapedNamespace(b=2, a=1)
+        ShapedNamespace(a=1, b=2)
+        >>> type(ShapedNamespace(a=3, b=4)) is type(ShapedNamespace(b=5, a=6))
+        True
+        >>> ShapedNamespace(a=1, b=2) == Namespace(a=1, b=2)
+        True
+    """
+    __slots__ = ()
+    __hash__ = None
+
+    def __new__(*args, **kwargs):
+        cls, = args  # not a named argument, so "cls" can be an attribute
+        key = cls, tuple(kwargs)
+        ref = _namespace_shape_refs.get(key)
+        shape = None if ref is None else ref()
+        if shape is None:
+            shape = cls.__make_shape(key, tuple(sorted(kwargs)))
+        # the instance is initialized (by the generated __init__ of the shape) after this returns
+        return object.__new__(shape)
+
+    @classmethod
+    def __make_shape(cls, key, names):
+        if not all(_is_field_name(name) for name in names):
+            names = None
+        ref = _namespace_shape_refs.get((cls, names))
+        shape = None if ref is None else ref()
+        if shape is None:
+            if names is None:
+                shape = type(cls.__name__, (cls,), dict(
+                    __slots__=('__dict__',),
+                    __new__=object.__new__,
+                    __init__=_namespace_init,
+                    __repr__=Namespace.__dict__['__repr__'],
+                    __eq__=_namespace_eq,
+                    __ne__=_namespace_ne,
+                    __module__=cls.__module__,
+                ))
+                _set_weak_entry(_namespace_shape_refs, (cls, names), shape)
+            else:
+                base = slots_class_sealer(names, {})
+                sources = set()
+                shape = type(cls.__name__, (cls, base), dict(
+                    __slots__=(),
+                    __new__=object.__new__,
+                    __module__=cls.__module__,
+                    __fields_sources__=sources,
+                ))
+                _specialize_mixin(shape, base, names)
+                _claim_generated_code(base, shape)
+                _claim_generated_code(shape, shape)
+                _set_weak_entry(_namespace_shape_refs, (cls, names), shape, lambda: _forget_sources(sources))
+        if key != (cls, names):
+            _set_weak_entry(_namespace_shape_refs, key, shape)
+        _namespace_shapes[cls, names] = shape
+        return shape
+
+    @property
+    def __dict__(self):
+        return dict((name, getattr(self, name)) for name in self.__fields__)
+
+    def __reduce_ex__(self, protocol):
+        return _unpickle_namespace, (type(self).__mro__[1], self.__dict__)
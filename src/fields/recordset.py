@@ -0,0 +1,249 @@
+"""
+In-memory collection of records (instances of a sealed class) with secondary indexes.
+
+Example:
+
+.. sourcecode:: pycon
+
+    >>> from fields import Fields
+    >>> class Person(Fields.name.dept.age):
+    ...     pass
+    ...
+    >>> people = RecordSet(Person, hash_indexes=['dept'], sorted_indexes=['age'])
+    >>> people.extend([Person('alice', 'eng', 30), Person('bob', 'ops', 40), Person('carol', 'eng', 50)])
+    >>> people.lookup(dept='eng')
+    [Person(name='alice', dept='eng', age=30), Person(name='carol', dept='eng', age=50)]
+    >>> people.range('age', 35, 50)
+    [Person(name='bob', dept='ops', age=40), Person(name='carol', dept='eng', age=50)]
+    >>> sorted(people.group_by('dept'))
+    ['eng', 'ops']
+
+The indexed fields of the records in the set must not be changed (``remove`` the record, change it, then ``add`` it
+again).
+"""
+from bisect import bisect_left
+from bisect import bisect_right
+from operator import attrgetter
+
+__all__ = (
+    'RecordSet',
+)
+
+
+def _index_name(fields):
+    if isinstance(fields, str):
+        return fields
+    else:
+        fields = tuple(fields)
+        return fields[0] if len(fields) == 1 else fields
+
+
+class _HashIndex(object):
+    def __init__(self, fields):
+        self.key = attrgetter(*fields)
+        self.buckets = {}
+
+    def add(self, record):
+        key = self.key(record)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self.buckets[key] = {id(record): record}
+        else:
+            bucket[id(record)] = record
+
+    def remove(self, record):
+        key = self.key(record)
+        bucket = self.buckets[key]
+        del bucket[id(record)]
+        if not bucket:
+            del self.buckets[key]
+
+    def lookup(self, key):
+        bucket = self.buckets.get(key)
+        return list(bucket.values()) if bucket else []
+
+
+class _SortedIndex(object):
+    def __init__(self, fields):
+        self.key = attrgetter(*fields)
+        self.keys = []
+        self.records = []
+
+    def add(self, record):
+        key = self.key(record)
+        position = bisect_right(self.keys, key)
+        self.keys.insert(position, key)
+        self.records.insert(position, record)
+
+    def extend(self, records):
+        key = self.key
+        pairs = sorted(
+            [(key(record), i, record) for i, record in enumerate(self.records)] +
+            [(key(record), i, record) for i, record in enumerate(records, len(self.records))]
+        )
+        self.keys = [key for key, _, _ in pairs]
+        self.records = [record for _, _, record in pairs]
+
+    def remove(self, record):
+        key = self.key(record)
+        for position in range(bisect_left(self.keys, key), bisect_right(self.keys, key)):
+            if self.records[position] is record:
+                del self.keys[position]
+                del self.records[position]
+                return
+        raise KeyError(record)
+
+    def range(self, low, high, include_low, include_high):
+        keys = self.keys
+        if low is None:
+            start = 0
+        else:
+            start = (bisect_left if include_low else bisect_right)(keys, low)
+        if high is None:
+            stop = len(keys)
+        else:
+            stop = (bisect_right if include_high else bisect_left)(keys, high)
+        return self.records[start:stop]
+
+
+class RecordSet(object):
+    """
+    A collection of records with optional hash indexes (for :meth:`lookup` and :meth:`group_by`) and sorted indexes
+    (for :meth:`range`). Records are kept in insertion order and are compared by identity.
+
+    Args:
+        cls: The sealed class of the records.
+        records: Optional iterable of initial records.
+        hash_indexes: Fields (or tuples of fields, for composite indexes) to make hash indexes for.
+        sorted_indexes: Fields (or tuples of fields) to make sorted indexes for.
+    """
+    def __init__(self, cls, records=(), hash_indexes=(), sorted_indexes=()):
+        self.cls = cls
+        self._records = {}
+        self._hash_indexes = {}
+        self._sorted_indexes = {}
+        for indexes, index_class, name in (
+            (hash_indexes, _HashIndex, 'hash_indexes'),
+            (sorted_indexes, _SortedIndex, 'sorted_indexes'),
+        ):
+            for fields in indexes:
+                fields = (fields,) if isinstance(fields, str) else tuple(fields)
+                unknown = [field for field in fields if field not in cls.__fields__]
+                if unknown:
+                    raise TypeError("Can't index unknown fields %r (in %s)." % (unknown, name))
+                index = index_class(fields)
+                if index_class is _HashIndex:
+                    self._hash_indexes[_index_name(fields)] = index
+                else:
+                    self._sorted_indexes[_index_name(fields)] = index
+        self.extend(records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self._records.values())
+
+    def __contains__(self, record):
+        return id(record) in self._records
+
+    def __repr__(self):
+        return "RecordSet({0}, <{1} records>)".format(self.cls.__name__, len(self))
+
+    def add(self, record):
+        """
+        Add a record (adding a record that is already in the set does nothing).
+        """
+        if id(record) not in self._records:
+            self._records[id(record)] = record
+            for index in self._hash_indexes.values():
+                index.add(record)
+            for index in self._sorted_indexes.values():
+                index.add(record)
+
+    def extend(self, records):
+        """
+        Add many records. Faster than calling :meth:`add` for each record (the sorted indexes are rebuilt once).
+        """
+        added = []
+        for record in records:
+            if id(record) not in self._records:
+                self._records[id(record)] = record
+                added.append(record)
+        for index in self._hash_indexes.values():
+            for record in added:
+                index.add(record)
+        for index in self._sorted_indexes.values():
+            index.extend(added)
+
+    def remove(self, record):
+        """
+        Remove a record. Raises ``KeyError`` if the record is not in the set.
+        """
+        del self._records[id(record)]
+        for index in self._hash_indexes.values():
+            index.remove(record)
+        for index in self._sorted_indexes.values():
+            index.remove(record)
+
+    def discard(self, record):
+        """
+        Remove a record if it's in the set.
+        """
+        if id(record) in self._records:
+            self.remove(record)
+
+    def lookup(self, **values):
+        """
+        Return the records that have all the given field values. Uses a hash index if there's one for the given fields
+        (or a subset of them), otherwise does a linear scan.
+        """
+        if not values:
+            return list(self)
+        names = tuple(sorted(values))
+        best = None
+        for name, index in self._hash_indexes.items():
+            fields = (name,) if isinstance(name, str) else name
+            if set(fields).issubset(names) and (best is None or len(fields) > len(best[0])):
+                best = fields, index
+        if best is None:
+            candidates = self._records.values()
+            rest = values
+        else:
+            fields, index = best
+            candidates = index.lookup(values[fields[0]] if len(fields) == 1 else tuple(values[field] for field in fields))
+            rest = dict((field, value) for field, value in values.items() if field not in fields)
+        if rest:
+            getter = attrgetter(*rest)
+            expected = tuple(rest.values()) if len(rest) > 1 else next(iter(rest.values()))
+            return [record for record in candidates if getter(record) == expected]
+        else:
+            return list(candidates)
+
+    def range(self, field, low=None, high=None, include_low=True, include_high=True):
+        """
+        Return the records that have ``field`` between ``low`` and ``high`` (``None`` means unbounded), ordered by
+        ``field``. Requires a sorted index on ``field``.
+        """
+        name = _index_name(field)
+        try:
+            index = self._sorted_indexes[name]
+        except KeyError:
+            raise TypeError("There's no sorted index for %r." % (name,))
+        return index.range(low, high, include_low, include_high)
+
+    def group_by(self, field):
+        """
+        Return a dict with the records grouped by the value of ``field`` (or a tuple of fields). Uses the hash index if
+        there's one.
+        """
+        name = _index_name(field)
+        index = self._hash_indexes.get(name)
+        if index is None:
+            key = attrgetter(*((name,) if isinstance(name, str) else name))
+            groups = {}
+            for record in self._records.values():
+                groups.setdefault(key(record), []).append(record)
+            return groups
+        else:
+            return dict((key, list(bucket.values())) for key, bucket in index.buckets.items())
@@ -0,0 +1,194 @@
+"""
+Stable hashing (the same in every process and on every host, unlike ``hash()``) for partitioning records. Requires
+Python 3.6+ (``hashlib.blake2b``).
+
+The hash is BLAKE2b over a canonical encoding of the values. Supported values: ``None``, ``bool``, ``int``, ``float``,
+``str``, ``bytes``, ``tuple``, ``list``, ``dict``, ``set``, ``frozenset`` and records (instances of sealed classes).
+Values that compare equal hash the same (eg: ``1``, ``1.0`` and ``True``), except for containers of different types
+(a ``tuple`` and a ``list`` with the same items don't compare equal either).
+
+The builtin sealers give the classes generated ``stable_hash()`` and ``fingerprint()`` methods that read the fields
+directly.
+
+Example:
+
+.. sourcecode:: pycon
+
+    >>> from fields import Tuple
+    >>> class Point(Tuple.x.y):
+    ...     pass
+    ...
+    >>> Point(1, 2).stable_hash() == stable_hash(Point(1, 2))
+    True
+    >>> shards = partition([Point(i, i) for i in range(100)], 4)
+    >>> sum(len(shard) for shard in shards)
+    100
+"""
+import struct
+from hashlib import blake2b
+
+from fields import _exec_code
+from fields import _field_accessor
+
+__all__ = (
+    'fingerprint',
+    'partition',
+    'stable_hash',
+)
+
+_LENGTH = struct.Struct('>Q').pack
+_FLOAT = struct.Struct('>d').pack
+_NONE = b'n'
+_TRUE = b'i' + _LENGTH(1) + b'1'
+_FALSE = b'i' + _LENGTH(1) + b'0'
+
+
+def _encode_int(value, update):
+    data = str(int(value)).encode('ascii')
+    update(b'i' + _LENGTH(len(data)) + data)
+
+
+def _encode_float(value, update):
+    if value.is_integer():
+        _encode_int(value, update)
+    else:
+        update(b'f' + _FLOAT(value))
+
+
+def _encode_str(value, update):
+    data = value.encode('utf-8', 'surrogatepass')
+    update(b's' + _LENGTH(len(data)) + data)
+
+
+def _encode_bytes(value, update):
+    update(b'b' + _LENGTH(len(value)) + value)
+
+
+def _encode_items(tag, values, update):
+    update(tag + _LENGTH(len(values)))
+    for value in values:
+        _encode(value, update)
+
+
+def _encoded(value):
+    chunks = []
+    _encode(value, chunks.append)
+    return b''.join(chunks)
+
+
+def _encode_set(value, update):
+    encoded = sorted(_encoded(item) for item in value)
+    update(b'S' + _LENGTH(len(encoded)))
+    for data in encoded:
+        update(data)
+
+
+def _encode_dict(value, update):
+    encoded = sorted(_encoded(key) + _encoded(item) for key, item in value.items())
+    update(b'd' + _LENGTH(len(encoded)))
+    for data in encoded:
+        update(data)
+
+
+def _encode_record(value, update):
+    fields = type(value).__fields__
+    update(b'r' + _LENGTH(len(fields)))
+    for field in fields:
+        _encode(getattr(value, field), update)
+
+
+_ENCODERS = {
+    type(None): lambda value, update: update(_NONE),
+    bool: lambda value, update: update(_TRUE if value else _FALSE),
+    int: _encode_int,
+    float: _encode_float,
+    str: _encode_str,
+    bytes: _encode_bytes,
+    tuple: lambda value, update: _encode_items(b't', value, update),
+    list: lambda value, update: _encode_items(b'l', value, update),
+    set: _encode_set,
+    frozenset: _encode_set,
+    dict: _encode_dict,
+}
+
+
+def _encode(value, update):
+    encoder = _ENCODERS.get(type(value))
+    if encoder is not None:
+        encoder(value, update)
+    elif hasattr(type(value), '__fields__'):
+        _encode_record(value, update)
+    else:
+        for kind, encoder in _ENCODERS.items():
+            if isinstance(value, kind):
+                return encoder(value, update)
+        raise TypeError("Can't make a stable hash for %r (unsupported type %s)." % (value, type(value).__name__))
+
+
+def stable_hash(value):
+    """
+    Return a stable 64-bit hash (an unsigned ``int``) for ``value``.
+    """
+    digest = blake2b(digest_size=8)
+    _encode(value, digest.update)
+    return int.from_bytes(digest.digest(), 'big')
+
+
+def fingerprint(value):
+    """
+    Return a stable 128-bit fingerprint (16 ``bytes``) for ``value``.
+    """
+    digest = blake2b(digest_size=16)
+    _encode(value, digest.update)
+    return digest.digest()
+
+
+def partition(records, n, key=None):
+    """
+    Split ``records`` in ``n`` shards (a list of lists) by their stable hash. Records with equal values (or keys) end up
+    in the same shard in every process.
+
+    Args:
+        records: An iterable of records (they need a ``stable_hash`` method, like the classes made by the builtin
+            sealers) or any values if ``key`` is given.
+        n (int): The number of shards.
+        key: Optional callable that returns the value to shard by (eg: ``operator.attrgetter('user_id')``).
+    """
+    if n < 1:
+        raise ValueError("The number of shards must be at least 1 (got %r)." % n)
+    shards = [[] for _ in range(n)]
+    if key is None:
+        for record in records:
+            shards[record.stable_hash() % n].append(record)
+    else:
+        for record in records:
+            shards[stable_hash(key(record)) % n].append(record)
+    return shards
+
+
+def make_hash_methods(owner, fields):
+    """
+    Generate the ``stable_hash`` and ``fingerprint`` methods for a sealed class. They give the same results as the
+    functions in this module.
+    """
+    header = b'r' + _LENGTH(len(fields))
+    body = ''.join('    __encode({0}, update)\n'.format(_field_accessor(owner, field, 'self')) for field in fields)
+    code = (
+        'def stable_hash(self):\n'
+        '    digest = __blake2b(digest_size=8)\n'
+        '    update = digest.update\n'
+        '    update(__header)\n'
+        '{0}'
+        '    return __from_bytes(digest.digest(), "big")\n'
+        '\n'
+        'def fingerprint(self):\n'
+        '    digest = __blake2b(digest_size=16)\n'
+        '    update = digest.update\n'
+        '    update(__header)\n'
+        '{0}'
+        '    return digest.digest()\n'
+    ).format(body)
+    global_namespace = dict(__blake2b=blake2b, __encode=_encode, __header=header, __from_bytes=int.from_bytes)
+    local_namespace = {}
+    _exec_code(code, 'stable-hash', global_namespace, local_namespace)
+    return local_namespace
@@ -0,0 +1,234 @@
+"""
+Fixed-layout record batches in ``multiprocessing.shared_memory`` (Python 3.8+).
+
+All the fields need a declared numeric or fixed-size type (see :func:`fields.field_types`): ``int``, ``float``,
+``bool`` or any single-item :mod:`struct` format (eg: ``'i'``, ``'f'``, ``'16s'``).
+
+Example:
+
+.. sourcecode:: pycon
+
+    >>> from fields import SlotsFields
+    >>> class Point(SlotsFields.x.y):
+    ...     pass
+    ...
+    >>> types = {'x': float, 'y': float}
+    >>> batch = SharedBatch.create(Point, [Point(1, 2), Point(3, 4)], types)
+    >>> other = SharedBatch.attach(Point, batch.name, types)  # usually in another process
+    >>> other[1]
+    Point(x=3.0, y=4.0)
+    >>> other[1].x = 5
+    >>> batch[1].x
+    5.0
+    >>> other.close()
+    >>> batch.close()
+    >>> batch.unlink()
+"""
+import struct
+from multiprocessing import shared_memory
+from operator import attrgetter
+
+from fields import field_types
+from fields.views import make_view_class
+
+__all__ = (
+    'SharedBatch',
+    'RecordLayout',
+)
+
+_FORMATS = {
+    bool: '?',
+    int: 'q',
+    float: 'd',
+}
+_HEADER = struct.Struct('<QQ')
+
+
+class RecordLayout(object):
+    """
+    Binary layout (little-endian, no padding) of a sealed class. Also makes the view class for records stored in a
+    buffer: it has the same attributes as the sealed class and reads/writes go straight to the buffer.
+    """
+    def __init__(self, cls, types=None):
+        self.cls = cls
+        self.fields = cls.__fields__
+        self.formats = []
+        for name, kind in field_types(cls, types).items():
+            fmt = _FORMATS.get(kind, kind)
+            try:
+                items = len(struct.unpack('<' + fmt, bytes(struct.calcsize('<' + fmt))))
+            except (struct.error, TypeError):
+                items = 0
+            if items != 1:
+                raise TypeError("Field %r doesn't have a fixed-size type (got %r)." % (name, kind))
+            self.formats.append(fmt)
+        self.struct = struct.Struct('<' + ''.join(self.formats))
+        self.size = self.struct.size
+        self.view = self._make_view()
+
+    @classmethod
+    def of(cls, record_class, types=None):
+        """
+        Return a cached layout (only when ``types`` is not given). The layout is cached on ``record_class`` (it refers
+        to the class, so a cache keyed by the class would keep it alive).
+        """
+        if types:
+            return cls(record_class, types)
+        layout = record_class.__dict__.get('__fields_record_layout__')
+        if layout is None:
+            layout = cls(record_class)
+            record_class.__fields_record_layout__ = layout
+        return layout
+
+    def pack(self, records):
+        """
+        Return the packed bytes for an iterable of records.
+        """
+        pack = self.struct.pack
+        if issubclass(self.cls, tuple):
+            return b''.join([pack(*record) for record in records])
+        elif len(self.fields) == 1:
+            name, = self.fields
+            return b''.join([pack(getattr(record, name)) for record in records])
+        else:
+            getter = attrgetter(*self.fields)
+            return b''.join([pack(*getter(record)) for record in records])
+
+    def unpack(self, buffer):
+        """
+        Decode all the records in ``buffer`` (in bulk).
+        """
+        cls = self.cls
+        strip = [i for i, fmt in enumerate(self.formats) if fmt.endswith('s')]
+        if strip:
+            result = []
+            for values in self.struct.iter_unpack(buffer):
+                values = list(values)
+                for i in strip:
+                    values[i] = values[i].rstrip(b'\0')
+                result.append(cls(*values))
+            return result
+        else:
+            return [cls(*values) for values in self.struct.iter_unpack(buffer)]
+
+    def _make_view(self):
+        cls = self.cls
+        fields = self.fields
+
+        def make_property(offset, fmt):
+            field_struct = struct.Struct('<' + fmt)
+            unpack_from = field_struct.unpack_from
+            pack_into = field_struct.pack_into
+
+            if fmt.endswith('s'):
+                def getter(self):
+                    return unpack_from(self._buffer, self._offset + offset)[0].rstrip(b'\0')
+            else:
+                def getter(self):
+                    return unpack_from(self._buffer, self._offset + offset)[0]
+
+            def setter(self, value):
+                pack_into(self._buffer, self._offset + offset, value)
+
+            return property(getter, setter)
+
+        properties = []
+        offset = 0
+        for name, fmt in zip(fields, self.formats):
+            properties.append((name, make_property(offset, fmt)))
+            offset += struct.calcsize('<' + fmt)
+
+        def __init__(self, buffer, offset):
+            self._buffer = buffer
+            self._offset = offset
+
+        namespace = dict(
+            properties,
+            __slots__=('_buffer', '_offset'),
+            __init__=__init__,
+        )
+        return make_view_class(cls, '{0}View'.format(cls.__name__), namespace)
+
+
+class SharedBatch(object):
+    """
+    A batch of records stored in a ``SharedMemory`` block. Use :meth:`create` to make a new block and :meth:`attach`
+    to use an existing block (by name) from another process. Items are zero-copy views over the shared memory.
+
+    The views can't be used after :meth:`close` (and any other exports of :attr:`buffer` need to be released before
+    that).
+    """
+    def __init__(self, cls, shm, layout):
+        count, size = _HEADER.unpack_from(shm.buf)
+        if size != layout.size:
+            raise TypeError("Record size mismatch: the block has %s bytes/record, %r has %s bytes/record." % (
+                size, cls, layout.size
+            ))
+        self.cls = cls
+        self.shm = shm
+        self.layout = layout
+        self.count = count
+        self.buffer = shm.buf[_HEADER.size:_HEADER.size + count * size]
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def create(cls, record_class, records, types=None, name=None):
+        """
+        Write ``records`` in a new shared memory block.
+        """
+        layout = RecordLayout.of(record_class, types)
+        data = layout.pack(records)
+        count = len(data) // layout.size
+        shm = shared_memory.SharedMemory(name=name, create=True, size=_HEADER.size + max(len(data), 1))
+        _HEADER.pack_into(shm.buf, 0, count, layout.size)
+        shm.buf[_HEADER.size:_HEADER.size + len(data)] = data
+        return cls(record_class, shm, layout)
+
+    @classmethod
+    def attach(cls, record_class, name, types=None):
+        """
+        Attach to an existing shared memory block (made with :meth:`create`).
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:  # Python < 3.13
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(record_class, shm, RecordLayout.of(record_class, types))
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return self.layout.view(self.buffer, index * self.layout.size)
+
+    def __iter__(self):
+        view = self.layout.view
+        buffer = self.buffer
+        for offset in range(0, self.count * self.layout.size, self.layout.size):
+            yield view(buffer, offset)
+
+    def to_records(self):
+        """
+        Decode all the records (makes copies).
+        """
+        return self.layout.unpack(self.buffer)
+
+    def close(self):
+        self.buffer.release()
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,196 @@
+"""
+Async decoding of record streams (Python 3.6+).
+
+Records are read from an ``asyncio.StreamReader`` in large chunks and decoded in batches, so there's one ``await`` per
+chunk instead of one per record. Supported formats:
+
+* ``"ndjson"`` - newline-delimited JSON. Each line is an object (passed as keyword arguments, the keys that aren't
+  fields are ignored unless ``ignore_extra=False``) or an array (passed as positional arguments).
+* ``"binary"`` - length-prefixed frames: a 4 byte big-endian unsigned length followed by the payload. Payloads are
+  decoded with the ``decode`` callable if given, otherwise they must be the packed fields of the record (see
+  :class:`fields.sharedmem.RecordLayout`, the field types need to be declared).
+
+Nothing is read ahead of the consumer: the next chunk is only read after the previous batch was taken, so a slow
+consumer lets the ``StreamReader`` buffer fill up, and that pauses reading from the transport (backpressure).
+
+Example:
+
+.. sourcecode:: python
+
+    class Point(Fields.x.y):
+        pass
+
+    async def handle(reader, writer):
+        async for point in Point.aiter_from_stream(reader):
+            ...
+"""
+import asyncio
+import json
+import struct
+
+__all__ = (
+    'aiter_batches',
+    'aiter_records',
+)
+
+FORMATS = 'ndjson', 'binary'
+_FRAME_HEADER = struct.Struct('!I')
+
+
+async def _ndjson_blocks(reader, chunk_size, max_record_size):
+    # the partial last line is kept in a bytearray and only the new chunk is searched for the newline, so a long line
+    # that spans many chunks isn't copied (or scanned) again for every chunk
+    pending = bytearray()
+    while True:
+        chunk = await reader.read(chunk_size)
+        if not chunk:
+            break
+        end = chunk.rfind(b'\n')
+        if end == -1:
+            pending += chunk
+        else:
+            start = 0
+            lines = []
+            if pending:
+                start = chunk.find(b'\n') + 1
+                pending += memoryview(chunk)[:start - 1]
+                lines.append(bytes(pending))
+            if start <= end:
+                lines.extend(chunk[start:end].split(b'\n'))
+            yield lines
+            pending = bytearray(memoryview(chunk)[end + 1:])
+        if len(pending) > max_record_size:
+            raise ValueError("Record is larger than max_record_size (%s bytes)." % max_record_size)
+    if pending.strip():
+        yield [bytes(pending)]
+
+
+async def _binary_blocks(reader, chunk_size, max_record_size):
+    unpack_from = _FRAME_HEADER.unpack_from
+    header_size = _FRAME_HEADER.size
+    pending = bytearray()
+    while True:
+        chunk = await reader.read(chunk_size)
+        if not chunk:
+            break
+        payloads = []
+        if pending:
+            # finish the frame that was cut at the end of the previous chunk: once its header is complete the rest of
+            # the payload is read at once (instead of appending chunk after chunk)
+            pending += chunk
+            if len(pending) < header_size:
+                continue
+            length, = unpack_from(pending)
+            if length > max_record_size:
+                raise ValueError("Record is larger than max_record_size (%s bytes)." % max_record_size)
+            end = header_size + length
+            if len(pending) < end:
+                try:
+                    pending += await reader.readexactly(end - len(pending))
+                except asyncio.IncompleteReadError as exc:
+                    raise asyncio.IncompleteReadError(bytes(pending) + exc.partial, None)
+            payloads.append(bytes(memoryview(pending)[header_size:end]))
+            chunk = bytes(memoryview(pending)[end:])
+            pending = bytearray()
+        size = len(chunk)
+        offset = 0
+        while size - offset >= header_size:
+            length, = unpack_from(chunk, offset)
+            if length > max_record_size:
+                raise ValueError("Record is larger than max_record_size (%s bytes)." % max_record_size)
+            end = offset + header_size + length
+            if end > size:
+                break
+            payloads.append(chunk[offset + header_size:end])
+            offset = end
+        if offset < size:
+            pending += memoryview(chunk)[offset:]
+        if payloads:
+            yield payloads
+    if pending:
+        raise asyncio.IncompleteReadError(bytes(pending), None)
+
+
+def _ndjson_decoder(cls, ignore_extra):
+    loads = json.loads
+    from_dicts = getattr(cls, 'from_dicts', None)
+    if from_dicts is not None:
+        from_dict = cls.from_dict
+
+        def make(item):
+            return from_dict(item, ignore_extra) if type(item) is dict else cls(*item)
+    else:
+        fields = getattr(cls, '__fields__', None) if ignore_extra else None
+
+        def make(item):
+            if not isinstance(item, dict):
+                return cls(*item)
+            if fields is not None:
+                item = dict((name, value) for name, value in item.items() if name in fields)
+            return cls(**item)
+
+    def decode(lines):
+        items = [loads(line) for line in lines if line.strip()]
+        if from_dicts is not None and all(type(item) is dict for item in items):
+            return from_dicts(items, ignore_extra)
+        return [make(item) for item in items]
+
+    return decode
+
+
+def _binary_decoder(cls, types, decode):
+    if decode is not None:
+        def decode_payloads(payloads):
+            return [decode(payload) for payload in payloads]
+    else:
+        from fields.sharedmem import RecordLayout
+
+        layout = RecordLayout.of(cls, types)
+
+        def decode_payloads(payloads):
+            for payload in payloads:
+                if len(payload) != layout.size:
+                    raise ValueError("Payload has %s bytes, expected %s bytes (the size of %r)." % (
+                        len(payload), layout.size, cls
+                    ))
+            return layout.unpack(b''.join(payloads))
+    return decode_payloads
+
+
+async def aiter_batches(cls, reader, format='ndjson', chunk_size=65536, max_record_size=16777216, types=None,
+                        decode=None, ignore_extra=True):
+    """
+    Read records from ``reader`` and yield them in batches (lists), one batch for every chunk read.
+
+    Args:
+        cls: The record class (usually a sealed class).
+        reader: An ``asyncio.StreamReader`` (or anything with compatible ``read`` and ``readexactly`` coroutines).
+        format (str): ``"ndjson"`` or ``"binary"``.
+        chunk_size (int): How much to read at once.
+        max_record_size (int): Records (lines or frame payloads) larger than this raise ``ValueError``.
+        types (dict): Field types for the default binary decoding (see :func:`fields.field_types`).
+        decode: Callable that makes a record from a frame payload (only for ``"binary"``).
+        ignore_extra (bool): Ignore the keys of ``"ndjson"`` objects that aren't fields of ``cls`` (like
+            ``cls.from_dict`` does), otherwise they raise ``TypeError``.
+    """
+    if format == 'ndjson':
+        blocks = _ndjson_blocks(reader, chunk_size, max_record_size)
+        decode_block = _ndjson_decoder(cls, ignore_extra)
+    elif format == 'binary':
+        blocks = _binary_blocks(reader, chunk_size, max_record_size)
+        decode_block = _binary_decoder(cls, types, decode)
+    else:
+        raise TypeError("Unknown format %r. Expected one of: %s." % (format, ', '.join(FORMATS)))
+    async for block in blocks:
+        batch = decode_block(block)
+        if batch:
+            yield batch
+
+
+async def aiter_records(cls, reader, format='ndjson', **options):
+    """
+    Like :func:`aiter_batches` but yields the records one by one (the decoding is still done in batches).
+    """
+    async for batch in aiter_batches(cls, reader, format, **options):
+        for record in batch:
+            yield record
@@ -0,0 +1,114 @@
+"""
+Containers backed by a ``ctypes.Structure``: the values are stored unboxed in the structure's buffer instead of as
+references to Python objects.
+
+Example:
+
+.. sourcecode:: pycon
+
+    >>> from fields import StructFields
+    >>> class Point(StructFields.x.y[0.0]):
+    ...     x: float
+    ...     y: float
+    ...
+    >>> Point(1.5)
+    Point(x=1.5, y=0.0)
+    >>> len(bytes(Point(1.5)))
+    16
+"""
+from fields import __base__
+from fields import _split_computed
+from fields import class_sealer
+from fields import factory
+
+__all__ = (
+    'StructFields',
+    'ctypes_sealer',
+)
+
+
+def _ctypes_field_type(name, kind):
+    import ctypes
+
+    simple = {bool: ctypes.c_bool, int: ctypes.c_int64, float: ctypes.c_double}
+    if kind in simple:
+        return simple[kind]
+    try:
+        ctypes.sizeof(kind)
+    except TypeError:
+        raise TypeError("Field %r doesn't have a ctypes-compatible type (got %r)." % (name, kind))
+    return kind
+
+
+def _checked_int_field(name, field):
+    """
+    Wrap the ``ctypes`` descriptor of an ``int`` field (a ``c_int64``) so assigning a value that doesn't fit raises
+    ``OverflowError`` instead of silently wrapping around.
+    """
+    set_value = field.__set__
+
+    def setter(self, value):
+        if not -0x8000000000000000 <= value <= 0x7FFFFFFFFFFFFFFF:
+            raise OverflowError("Value %r for field %r doesn't fit in a 64-bit signed integer." % (value, name))
+        set_value(self, value)
+    return property(field.__get__, setter)
+
+
+def _unpickle_struct(cls, data):
+    return cls.from_buffer_copy(data)
+
+
+def _reduce_struct(self):
+    return _unpickle_struct, (type(self), bytes(self))
+
+
+def ctypes_sealer(fields, defaults, types=None):
+    """
+    This sealer makes a container class backed by a ``ctypes.Structure`` (it uses :func:`fields.class_sealer`
+    internally). The values are stored unboxed in the structure's buffer instead of as references to Python objects.
+
+    The field types are taken from ``types`` and from the annotations in the body of the subclass. They can be ``int``
+    (stored as a 64-bit signed integer), ``float`` (a double), ``bool`` or any ctypes type (eg: ``ctypes.c_uint8``,
+    ``ctypes.c_char * 16``). The layout is set on the first class that has all the types.
+
+    Values that don't fit in an ``int`` field raise ``OverflowError`` (because of the check, reading these fields is
+    about 2x slower and assigning them about 4x slower than with ``ctypes.c_int64``). Fields with an explicit ctypes
+    type have the ctypes behavior: integers silently wrap around (eg: ``ctypes.c_uint8`` stores 256 as 0).
+
+    Instances support the buffer protocol (``bytes(obj)``, ``memoryview(obj)``, ``file.write(obj)``, zero-copy) and can
+    be made from bytes with ``Cls.from_buffer_copy(data)``.
+    """
+    import ctypes
+
+    declared = dict(types or ())
+    stored, _, computed_fields = _split_computed(fields, defaults)
+
+    class __struct_meta__(type(ctypes.Structure)):
+        def __new__(mcs, name, bases, namespace):
+            checked = ()
+            if '_fields_' not in namespace and not any(getattr(base, '__fields_struct__', False) for base in bases):
+                known = dict(declared)
+                known.update(namespace.get('__annotations__', ()))
+                missing = [field for field in stored if field not in known]
+                if missing and '__fields__' not in namespace and any(hasattr(base, '__fields__') for base in bases):
+                    raise TypeError("Fields %r of %r don't have a declared type." % (missing, name))
+                elif not missing:
+                    namespace['_fields_'] = [(field, _ctypes_field_type(field, known[field])) for field in stored]
+                    namespace['__fields_struct__'] = True
+                    checked = [field for field in stored if known[field] is int]
+            if '__slots__' not in namespace:
+                namespace['__slots__'] = ()
+            cls = type(ctypes.Structure).__new__(mcs, name, bases, namespace)
+            for field in checked:
+                setattr(cls, field, _checked_int_field(field, cls.__dict__[field]))
+            return cls
+
+    struct_base = __struct_meta__('__struct_base__', (ctypes.Structure,), dict(
+        __slots__=('__fields_cache__',) if computed_fields else (),
+        __init__=__base__.__dict__['__init__'],
+        __reduce__=_reduce_struct,
+    ))
+    return class_sealer(fields, defaults, base=struct_base)
+
+
+StructFields = factory(ctypes_sealer)
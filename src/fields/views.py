@@ -0,0 +1,57 @@
+"""
+View classes for records that are stored outside of the instances (rows of a structured array, records in a buffer,
+encoded blobs). A view has the same attributes as the sealed class and the values are read from the storage.
+"""
+
+__all__ = (
+    'make_view_class',
+)
+
+
+def make_view_class(cls, name, namespace, value=getattr):
+    """
+    Make a view class for the records of ``cls``. Besides ``namespace`` the class gets a ``__repr__`` that looks like
+    the one of ``cls``, ``__eq__``/``__ne__`` that compare with records and other views of the same kind, and an
+    ``as_record()`` method. Views are not hashable (they are usually mutable).
+
+    Args:
+        cls: The sealed class.
+        name (str): The name of the view class.
+        namespace (dict): The rest of the class namespace (``__slots__``, ``__init__`` and the field descriptors).
+        value: Callable that takes ``view, field`` and returns the plain value of the field (default: ``getattr``).
+    Return:
+        The view class.
+    """
+    fields = cls.__fields__
+
+    def __repr__(self):
+        return "{0}({1})".format(
+            cls.__name__,
+            ", ".join("{0}={1!r}".format(name, value(self, name)) for name in fields)
+        )
+
+    def __eq__(self, other):
+        if isinstance(other, (cls, view)):
+            return tuple(getattr(self, name) for name in fields) == tuple(getattr(other, name) for name in fields)
+        else:
+            return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return NotImplemented
+        else:
+            return not result
+
+    def as_record(self):
+        return cls(*[value(self, name) for name in fields])
+
+    view = type(name, (object,), dict(
+        namespace,
+        __repr__=__repr__,
+        __eq__=__eq__,
+        __ne__=__ne__,
+        __hash__=None,
+        as_record=as_record,
+    ))
+    return view
@@ -1,9 +1,17 @@
 from __future__ import print_function
 
+import gc
+import inspect
+import os
 import pickle
+import sqlite3
+import subprocess
+import sys
 from functools import partial
 
 from pytest import fixture
+from pytest import importorskip
+from pytest import mark
 from pytest import raises
 
 from fields import BareFields
@@ -12,10 +20,26 @@ from fields import ConvertibleFields
 from fields import ConvertibleMixin
 from fields import Fields
 from fields import InheritableFields
+from fields import Namespace
 from fields import PrintableMixin
+from fields import SealerPipeline
+from fields import ShapedNamespace
 from fields import SlotsFields
+from fields import StructFields
 from fields import Tuple
+from fields import _spec_classes
+from fields import class_sealer
+from fields import computed
+from fields import ctypes_sealer
+from fields import default_factory
+from fields import factory
+from fields import field_types
+from fields import generated_code
 from fields import make_init_func
+from fields import row_factory
+from fields import row_factory_for
+from fields import slots_class_sealer
+from fields import tuple_sealer
 from fields.extras import RegexValidate
 from fields.extras import ValidationError
 
@@ -59,6 +83,12 @@ class G3(Fields.a.b[1].c[2]):
     pass
 
 
+class G4(Fields.user.time):
+    def __init__(self, user, time):
+        super(G4, self).__init__(user, time)
+        self.tag = -time
+
+
 def test_slots_class_has_slots():
     class Slots(SlotsFields.a.b[1]):
         pass
@@ -128,6 +158,54 @@ def test_printable():
     assert str(D(1, 2, 3)) == "D(a=1, b=2)"
 
 
+def test_mixins_specialized():
+    class D(BareFields.a.b.c, ComparableMixin.a.b, PrintableMixin.a.b, ConvertibleMixin.a.b):
+        pass
+
+    for name in '__eq__', '__ne__', '__lt__', '__hash__', '__repr__', 'as_dict', 'as_tuple':
+        assert name in D.__dict__
+    assert D(1, 2, 3) == D(1, 2, 4)
+    assert D(1, 2, 3) != D(1, 3, 3)
+    assert D(1, 2, 3) < D(1, 3, 0)
+    assert D(1, 2, 3) >= D(1, 2, 0)
+    assert D(1, 2, 3).__eq__(object()) is NotImplemented
+    assert hash(D(1, 2, 3)) == hash(D(1, 2, 4))
+    assert repr(D(1, 2, 3)) == "D(a=1, b=2)"
+    assert D(1, 2, 3).as_dict == {'a': 1, 'b': 2}
+    assert D(1, 2, 3).as_tuple == (1, 2)
+
+    class E(D):
+        pass
+
+    assert repr(E(1, 2, 3)) == "E(a=1, b=2)"
+    assert '__repr__' not in E.__dict__
+
+
+def test_mixins_specialized_tuple():
+    class T(Tuple.a.b.c, ConvertibleMixin.a.b.c):
+        pass
+
+    assert T(1, 2, 3).as_dict == {'a': 1, 'b': 2, 'c': 3}
+    assert T(1, 2, 3).as_tuple == (1, 2, 3)
+    assert 'self[2]' in inspect.getsource(T.__dict__['as_tuple'].fget)
+
+
+def test_mixins_specialized_overrides():
+    class Base(BareFields.a.b):
+        def __repr__(self):
+            return "custom"
+
+    class D(Base, PrintableMixin.a.b, ComparableMixin.a):
+        def __eq__(self, other):
+            return "custom"
+
+    assert repr(D(1, 2)) == "custom"
+    assert D(1, 2) == D(3, 4) == "custom"
+    assert '__repr__' not in D.__dict__
+    assert D.__dict__['__eq__'](D(1, 2), D(1, 2)) == "custom"
+    assert D(1, 2) < D(2, 0)
+
+
 def test_extra_args_2(impl):
     class X1(impl.a.b):
         pass
@@ -228,6 +306,45 @@ def test_factory_t3(impl):
     assert repr(t) == "T3(a=1)"
 
 
+def test_factory_cached_chain(impl):
+    assert impl.a.b[1].c[None] is impl.a.b[1].c[None]
+    assert impl.a.b[1] is not impl.a.b[True]
+    assert impl.a.b[1] is not impl.a.b[1.0]
+    assert impl.a[0.0] is not impl.a[-0.0]
+    assert impl.a[[]] is not impl.a[[]]
+    raises(TypeError, lambda: impl.a.b.a)
+    raises(TypeError, lambda: impl.a.b.a)
+
+
+def test_factory_cached_chain_seals_per_class(impl):
+    class A(impl.x.y):
+        pass
+
+    chain = impl.x.y
+    gc.collect()
+
+    class B(chain):
+        pass
+
+    class C(chain):
+        pass
+
+    bases = set(klass.__bases__[0] for klass in (A, B, C))
+    assert len(bases) == 3
+    assert ~chain is ~chain
+
+
+def test_factory_cached_chain_collected(impl):
+    chain = impl.collected.a.b
+    leaf = chain.c
+    del chain
+    gc.collect()
+    assert impl.collected.a.b.c is leaf
+    del leaf
+    gc.collect()
+    assert 'collected' not in impl._Factory__children
+
+
 def test_factory_empty_raise(impl):
     raises(TypeError, type, "T5", (impl,), {})
 
@@ -536,3 +653,1529 @@ def test_multiple_inheritance():
 
     Person(name='hans', age='43')
     raises(TypeError, Person, name='hans', age='43', bogus='crappo')
+
+
+def test_multiple_inheritance_flat_init():
+    class A(InheritableFields.name.nick[None]):
+        pass
+
+    class B(InheritableFields.age.score[0]):
+        pass
+
+    class Person(A, B):
+        pass
+
+    assert Person.__init__.__fields_flat__
+    person = Person('hans', age=43)
+    assert (person.name, person.nick, person.age, person.score) == ('hans', None, 43, 0)
+    person = Person(name='hans', nick='h', age=43, score=1)
+    assert (person.name, person.nick, person.age, person.score) == ('hans', 'h', 43, 1)
+    raises(TypeError, Person, 'hans', 43)
+    raises(TypeError, Person, name='hans')
+    raises(TypeError, Person, name='hans', age=43, bogus=1)
+
+    class Employee(Person):
+        pass
+
+    assert Employee.__init__ is not Person.__init__
+    assert Employee('hans', age=43).age == 43
+
+
+def test_multiple_inheritance_flat_init_fallback():
+    calls = []
+
+    class A(InheritableFields.name):
+        pass
+
+    class Mixin(object):
+        def __init__(self, **kwargs):
+            calls.append(kwargs)
+            super(Mixin, self).__init__(**kwargs)
+
+    class B(InheritableFields.age):
+        pass
+
+    class Person(A, Mixin, B):
+        pass
+
+    assert not getattr(Person.__init__, '__fields_flat__', False)
+    person = Person(name='hans', age=43)
+    assert (person.name, person.age) == ('hans', 43)
+    assert calls == [dict(age=43)]
+
+    class Custom(Person):
+        def __init__(self, **kwargs):
+            super(Custom, self).__init__(**kwargs)
+            self.custom = True
+
+    assert Custom(name='hans', age=43).custom
+
+
+def test_multiple_inheritance_flat_init_repeated_field():
+    class A(InheritableFields.name):
+        pass
+
+    class B(InheritableFields.name):
+        pass
+
+    class Person(A, B):
+        pass
+
+    assert not getattr(Person.__init__, '__fields_flat__', False)
+    raises(TypeError, Person, name='hans')
+
+
+def test_field_types():
+    class Point(Fields.x.y.z[0]):
+        pass
+
+    raises(TypeError, field_types, Point)
+    raises(TypeError, field_types, object)
+    assert list(field_types(Point, dict(x=int, y=float, z=int, bogus=str)).items()) == [('x', int), ('y', float), ('z', int)]
+    assert list(field_types(Tuple.a, dict(a=str)).items()) == [('a', str)]
+
+
+def test_field_types_annotations():
+    Point = type('Point', (SlotsFields.x.y,), dict(__annotations__=dict(x=int, y=int)))
+    Point3D = type('Point3D', (Point,), dict(__annotations__=dict(y=float)))
+    assert list(field_types(Point3D).items()) == [('x', int), ('y', float)]
+    assert list(field_types(Point3D, dict(x=str)).items()) == [('x', str), ('y', float)]
+
+
+def test_numpy_dtype():
+    numpy = importorskip('numpy')
+    from fields.arrays import dtype_for
+
+    class Point(SlotsFields.x.y.label['']):
+        pass
+
+    assert dtype_for(Point, dict(x=float, y=int, label='U8')) == numpy.dtype([('x', 'f8'), ('y', 'i8'), ('label', 'U8')])
+    raises(TypeError, dtype_for, Point, dict(x=float, y=int, label=str))
+    raises(TypeError, dtype_for, Point, dict(x=float, y=int))
+
+
+def test_numpy_roundtrip(impl):
+    importorskip('numpy')
+    from fields.arrays import from_array
+    from fields.arrays import to_array
+
+    class Point(impl.x.y):
+        pass
+
+    records = [Point(1, 2.5), Point(3, 4.5)]
+    array = to_array(Point, records, dict(x=int, y=float))
+    assert array['x'].tolist() == [1, 3]
+    assert array['y'].tolist() == [2.5, 4.5]
+    assert from_array(Point, array) == records
+
+
+def test_numpy_tuple_roundtrip():
+    importorskip('numpy')
+    from fields.arrays import from_array
+    from fields.arrays import to_array
+
+    class Single(Tuple.a):
+        pass
+
+    array = to_array(Single, [Single(1), Single(2)], dict(a=int))
+    assert array['a'].tolist() == [1, 2]
+    assert from_array(Single, array) == [Single(1), Single(2)]
+
+
+def test_numpy_view():
+    importorskip('numpy')
+    from fields.arrays import ArrayView
+    from fields.arrays import to_array
+
+    class Point(Fields.x.y):
+        pass
+
+    array = to_array(Point, [Point(1, 2), Point(3, 4), Point(5, 6)], dict(x=int, y=int))
+    view = ArrayView(Point, array)
+    assert len(view) == 3
+    assert repr(view[1]) == 'Point(x=3, y=4)'
+    assert view[1] == Point(3, 4)
+    assert view[1] != Point(3, 5)
+    assert view[1].as_record() == Point(3, 4)
+    assert type(view[1].as_record()) is Point
+    for row in view[1:]:
+        row.y += 10
+    assert array['y'].tolist() == [2, 14, 16]
+    assert [row.x for row in view] == [1, 3, 5]
+    raises(AttributeError, setattr, view[0], 'bogus', 1)
+
+
+def test_numpy_view_class_collected():
+    importorskip('numpy')
+    import weakref
+
+    from fields.arrays import view_class
+
+    Point = type('Point', (Fields.x.y,), {})
+    assert view_class(Point) is view_class(Point)
+    ref = weakref.ref(Point)
+    del Point
+    gc.collect()
+    assert ref() is None
+
+
+@fixture(params=[Fields, SlotsFields, Tuple])
+def dynamic_class(request):
+    return type('Dynamic', (request.param.a.b[1],), {})
+
+
+def test_dynamic_class_pickle(dynamic_class, pickler, unpickler):
+    obj = dynamic_class(1, [2])
+    copy = unpickler(pickler(obj))
+    assert type(copy) is dynamic_class
+    assert copy == obj
+
+
+def test_dynamic_class_pickle_reseal(dynamic_class, pickler, unpickler):
+    data = pickler([dynamic_class(1), dynamic_class(2, 3)])
+    _spec_classes.clear()
+    first, second = unpickler(data)
+    assert type(first) is type(second)
+    assert type(first) is not dynamic_class
+    assert type(first).__name__ == 'Dynamic'
+    assert repr(first) == 'Dynamic(a=1, b=1)'
+    assert repr(second) == 'Dynamic(a=2, b=3)'
+    assert type(unpickler(data)[0]) is type(first)
+
+
+def test_dynamic_class_pickle_generated_methods(dynamic_class, pickler, unpickler):
+    obj = dynamic_class.from_dict(dict(a=1, b=2))
+    assert obj.to_json() == '{"a": 1, "b": 2}'
+    assert set(dynamic_class.__fields_generated__) >= set(['from_dict', 'from_dicts', 'to_json'])
+    copy = unpickler(pickler(obj))
+    assert type(copy) is dynamic_class
+    assert copy == obj
+
+
+def test_dynamic_class_pickle_same_name(pickler, unpickler):
+    first = type('Row', (Fields.a.b,), {})
+    data = pickler(first(1, 2))
+    second = type('Row', (Fields.a.b,), {})
+    assert type(unpickler(data)) is first
+    assert type(unpickler(pickler(second(1, 2)))) is second
+    assert type(unpickler(data)) is first
+
+
+def test_dynamic_class_pickle_no_leak(pickler):
+    import gc
+    import weakref
+
+    Row = type('Row', (Fields.a.b,), {})
+    pickler(Row(1, 2))
+    ref = weakref.ref(Row)
+    del Row
+    gc.collect()
+    assert ref() is None
+
+
+def test_dynamic_class_pickle_other_process(dynamic_class):
+    data = pickle.dumps(dynamic_class('foo', b=[1, 2]), protocol=2)
+    process = subprocess.Popen(
+        [sys.executable, '-c', 'import pickle, sys; print(repr(pickle.loads(getattr(sys.stdin, "buffer", sys.stdin).read())))'],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+    )
+    output, _ = process.communicate(data)
+    assert output.decode().strip() == "Dynamic(a='foo', b=[1, 2])"
+
+
+def test_dynamic_class_pickle_nosubclass(pickler, unpickler):
+    obj = Fields.a.b[1](2)
+    copy = unpickler(pickler(obj))
+    assert type(copy) is type(obj)
+    assert copy == obj
+
+
+def test_dynamic_class_pickle_with_methods(pickler):
+    Dynamic = type('Dynamic', (Fields.a,), dict(method=lambda self: self.a))
+    raises((pickle.PicklingError, AttributeError), pickler, Dynamic(1))
+
+
+def test_shared_batch():
+    sharedmem = importorskip('fields.sharedmem')
+
+    class Point(SlotsFields.x.y.label[b'']):
+        pass
+
+    types = dict(x=int, y=float, label='8s')
+    records = [Point(1, 1.5, b'foo'), Point(2, 2.5), Point(3, 3.5, b'12345678')]
+    batch = sharedmem.SharedBatch.create(Point, records, types)
+    try:
+        other = sharedmem.SharedBatch.attach(Point, batch.name, types)
+        assert len(other) == 3
+        assert other[0] == Point(1, 1.5, b'foo')
+        assert repr(other[-1]) == "Point(x=3, y=3.5, label=b'12345678')"
+        assert list(other) == records
+        assert other.to_records() == records
+        assert type(other[1].as_record()) is Point
+        other[1].y = 10
+        other[1].label = b'bar'
+        assert batch[1] == Point(2, 10.0, b'bar')
+        raises(IndexError, other.__getitem__, 3)
+        raises(TypeError, sharedmem.SharedBatch.attach, Point, batch.name, dict(types, x='h'))
+        other.close()
+    finally:
+        batch.close()
+        batch.unlink()
+
+
+def test_shared_batch_tuple():
+    sharedmem = importorskip('fields.sharedmem')
+
+    class Pair(Tuple.a.b):
+        pass
+
+    with sharedmem.SharedBatch.create(Pair, [Pair(1, True), Pair(2, False)], dict(a='i', b=bool)) as batch:
+        assert batch.to_records() == [Pair(1, True), Pair(2, False)]
+        assert [pair.b for pair in batch] == [True, False]
+        batch.unlink()
+
+
+def test_shared_batch_bad_types():
+    sharedmem = importorskip('fields.sharedmem')
+
+    class Record(SlotsFields.a.b):
+        pass
+
+    raises(TypeError, sharedmem.RecordLayout, Record, dict(a=int, b=str))
+    raises(TypeError, sharedmem.RecordLayout, Record, dict(a=int, b='2i'))
+    raises(TypeError, sharedmem.RecordLayout, Record, dict(a=int))
+
+
+def test_record_layout_collected():
+    sharedmem = importorskip('fields.sharedmem')
+    import weakref
+
+    Point = type('Point', (SlotsFields.x.y,), dict(__annotations__=dict(x=int, y=float)))
+    layout = sharedmem.RecordLayout.of(Point)
+    assert sharedmem.RecordLayout.of(Point) is layout
+    assert layout.view(bytearray(layout.pack([Point(1, 2)])), 0) == Point(1, 2.0)
+    ref = weakref.ref(Point)
+    del Point, layout
+    gc.collect()
+    assert ref() is None
+
+
+@fixture
+def connection():
+    connection = sqlite3.connect(':memory:')
+    connection.execute('create table person (id integer, name text, age integer)')
+    connection.executemany('insert into person values (?, ?, ?)', [(1, 'alice', 30), (2, 'bob', 40)])
+    return connection
+
+
+@fixture(params=[Fields, SlotsFields, Tuple])
+def record_impl(request):
+    return request.param
+
+
+def test_row_factory(connection, record_impl):
+    class Person(record_impl.name.age.id[None]):
+        pass
+
+    connection.row_factory = Person.row_factory
+    assert connection.execute('select * from person').fetchall() == [Person('alice', 30, 1), Person('bob', 40, 2)]
+    assert connection.execute('select age, name, 0 as extra from person').fetchall() == [
+        Person('alice', 30), Person('bob', 40)
+    ]
+    assert connection.execute('select age, name from person where id = 2').fetchall() == [Person('bob', 40, None)]
+    raises(TypeError, connection.execute('select name, id from person').fetchall)
+
+
+def test_row_factory_collected(connection):
+    import weakref
+
+    Person = type('Person', (Fields.name.age.id[None],), {})
+    connection.row_factory = Person.row_factory
+    assert connection.execute('select * from person').fetchall() == [Person('alice', 30, 1), Person('bob', 40, 2)]
+    Other = type('Other', (Fields.name.age.id,), {})
+    connection.row_factory = Other.row_factory
+    assert type(connection.execute('select * from person').fetchone()) is Other
+    ref = weakref.ref(Person)
+    del Person
+    gc.collect()
+    assert ref() is None
+
+
+def test_row_factory_missing_default_field(connection, record_impl):
+    class Person(record_impl.name.age[0].id[None]):
+        pass
+
+    connection.row_factory = Person.row_factory
+    assert connection.execute('select id, name from person').fetchall() == [Person('alice', 0, 1), Person('bob', 0, 2)]
+
+
+def test_row_factory_for(connection):
+    cursor = connection.execute('select name, age as "class", count(*), age, age from person group by id')
+    cursor.row_factory = row_factory_for(cursor.description)
+    rows = cursor.fetchall()
+    assert repr(rows[0]) == "Row(name='alice', _1=30, _2=1, age=30, _4=30)"
+    assert rows[1].name == 'bob'
+    assert isinstance(rows[1], tuple)
+    assert row_factory_for(cursor.description) is cursor.row_factory
+
+    cursor = connection.execute('select 1 as cls, 2 as self, 3 as super, 4 as tuple, 5 as _1, 6, 7 as _6, 8 as _0')
+    cursor.row_factory = row_factory_for(cursor.description)
+    row = cursor.fetchone()
+    assert type(row).__fields__ == ('_2', '_3', '_4', '_5', '_1', '_7', '_6', '_0')
+    assert tuple(row) == (1, 2, 3, 4, 5, 6, 7, 8)
+
+
+def test_generic_row_factory(connection):
+    connection.row_factory = row_factory
+    first, second = connection.execute('select name, id from person').fetchall()
+    assert first == ('alice', 1)
+    assert second.id == 2
+    assert type(first) is type(second)
+    assert type(connection.execute('select id, name from person').fetchone()) is not type(first)
+
+
+def test_from_dict(record_impl):
+    class Person(record_impl.name.age[0].tags[()]):
+        pass
+
+    assert Person.from_dict(dict(name='alice', age=30, tags=('x',))) == Person('alice', 30, ('x',))
+    assert Person.from_dict(dict(name='bob', extra=1)) == Person('bob')
+    assert type(Person.from_dict(dict(name='bob'))) is Person
+    exc = raises(TypeError, Person.from_dict, dict(age=1))
+    assert exc.value.args == ("Missing field 'name' for Person.",)
+    exc = raises(TypeError, Person.from_dict, dict(name='bob', extra=1), ignore_extra=False)
+    assert exc.value.args == ("Unexpected field 'extra' for Person.",)
+    assert Person.from_dict(dict(name='bob', age=1), ignore_extra=False) == Person('bob', 1)
+
+
+def test_generated_methods_super_calls(record_impl):
+    class Person(record_impl.name.age[0]):
+        @classmethod
+        def from_dict(cls, data, ignore_extra=True):
+            return super(Person, cls).from_dict(dict(data, name=data['name'].title()), ignore_extra)
+
+        def to_json(self):
+            return '[' + super(Person, self).to_json() + ']'
+
+        def stable_hash(self):
+            return super(Person, self).stable_hash() + 1
+
+    class Child(Person):
+        pass
+
+    for cls in Person, Child, Person:
+        person = cls.from_dict(dict(name='alice', age=30))
+        assert type(person) is cls
+        assert person == cls('Alice', 30)
+        assert person.to_json() == '[{"name": "Alice", "age": 30}]'
+        assert person.stable_hash() == super(Person, person).stable_hash() + 1
+        assert cls.from_dicts([dict(name='bob')]) == [cls('Bob')]
+    assert 'from_dict' not in Person.__dict__.get('__fields_generated__', ())
+
+
+def test_from_dicts(record_impl):
+    class Person(record_impl.name.age[0]):
+        pass
+
+    assert Person.from_dicts(iter([dict(name='alice', age=30), dict(name='bob', extra=1)])) == [
+        Person('alice', 30), Person('bob')
+    ]
+    exc = raises(TypeError, Person.from_dicts, [dict(name='alice'), dict(age=1)])
+    assert exc.value.args == ("Missing field 'name' for Person.",)
+    raises(TypeError, Person.from_dicts, [dict(name='alice', extra=1)], ignore_extra=False)
+
+
+def test_from_dict_custom_init(impl):
+    class Person(impl.name.age[0]):
+        def __init__(self, name, age=0):
+            super(Person, self).__init__(name.title(), age)
+
+    assert Person.from_dict(dict(name='alice')) == Person('Alice')
+    assert Person.from_dicts([dict(name='alice')]) == [Person('Alice')]
+
+
+def test_from_dict_subclass_custom_init(impl):
+    class Person(impl.name.age[0]):
+        pass
+
+    class Employee(Person):
+        def __init__(self, name, age=0):
+            super(Employee, self).__init__(name.title(), age)
+
+    assert Person.from_dict(dict(name='alice')) == Person('alice')
+    assert Employee.from_dict(dict(name='alice')) == Employee('Alice')
+    assert Employee.from_dicts([dict(name='alice')]) == [Employee('Alice')]
+
+
+def test_from_dict_validation():
+    class Test(RegexValidate.value['aa+'], Fields.value):
+        pass
+
+    raises(ValidationError, Test.from_dict, dict(value='a'))
+    raises(ValidationError, Test.from_dicts, [dict(value='a')])
+    assert Test.from_dict(dict(value='aa')).value == 'aa'
+
+
+def test_recordset(record_impl):
+    from fields.recordset import RecordSet
+
+    class Person(record_impl.name.dept.age):
+        pass
+
+    alice = Person('alice', 'eng', 30)
+    bob = Person('bob', 'ops', 40)
+    carol = Person('carol', 'eng', 50)
+    dave = Person('dave', 'eng', 30)
+    people = RecordSet(Person, [alice, bob, carol], hash_indexes=['dept', ('dept', 'age')], sorted_indexes=['age'])
+    people.add(dave)
+    people.add(dave)
+    assert len(people) == 4
+    assert list(people) == [alice, bob, carol, dave]
+    assert dave in people
+    assert people.lookup(dept='eng') == [alice, carol, dave]
+    assert people.lookup(dept='eng', age=30) == [alice, dave]
+    assert people.lookup(dept='eng', age=30, name='dave') == [dave]
+    assert people.lookup(name='bob') == [bob]
+    assert people.lookup(dept='hr') == []
+    assert people.range('age', 30, 40) == [alice, dave, bob]
+    assert people.range('age', 30, 40, include_low=False) == [bob]
+    assert people.range('age', 30, 40, include_high=False) == [alice, dave]
+    assert people.range('age', low=40) == [bob, carol]
+    assert people.range('age') == [alice, dave, bob, carol]
+    raises(TypeError, people.range, 'name')
+    assert people.group_by('dept') == {'eng': [alice, carol, dave], 'ops': [bob]}
+    assert people.group_by('age') == {30: [alice, dave], 40: [bob], 50: [carol]}
+    assert people.group_by(['dept', 'age'])[('eng', 30)] == [alice, dave]
+
+    people.remove(alice)
+    raises(KeyError, people.remove, alice)
+    people.discard(alice)
+    people.discard(bob)
+    assert list(people) == [carol, dave]
+    assert people.lookup(dept='eng', age=30) == [dave]
+    assert people.lookup(dept='ops') == []
+    assert people.range('age') == [dave, carol]
+    assert people.group_by('dept') == {'eng': [carol, dave]}
+
+
+def test_recordset_equal_records():
+    from fields.recordset import RecordSet
+
+    class Point(Fields.x.y):
+        pass
+
+    first, second = Point(1, 2), Point(1, 2)
+    points = RecordSet(Point, [first, second], hash_indexes=['x'], sorted_indexes=['y'])
+    points.remove(second)
+    assert points.lookup(x=1)[0] is first
+    assert points.range('y')[0] is first
+
+
+def test_recordset_bad_index():
+    from fields.recordset import RecordSet
+
+    class Point(Fields.x.y):
+        pass
+
+    raises(TypeError, RecordSet, Point, hash_indexes=['z'])
+    raises(TypeError, RecordSet, Point, sorted_indexes=[('x', 'z')])
+
+
+@mark.skipif(sys.version_info < (3, 8), reason="Needs CodeType.replace")
+def test_generated_code_names():
+    class Point(Fields.x.y[0]):
+        pass
+
+    class Other(Point):
+        pass
+
+    qualname = Point.__qualname__
+    codes = generated_code(Point)
+    assert list(codes) == ['__init__']
+    assert codes['__init__'].co_filename == '<fields-init {0}.{1}>'.format(__name__, qualname)
+    assert codes['__init__'].co_name == '__init__'
+    assert Point.__init__.__qualname__ == qualname + '.__init__'
+    assert 'self.y = y' in inspect.getsource(Point.__init__)
+    assert generated_code(Other) == codes
+
+    Other.from_dict({'x': 1})
+    assert generated_code(Other)['from_dict'].co_filename == '<fields-from-dict {0}.{1}>'.format(
+        __name__, Other.__qualname__
+    )
+
+    class Mixed(BareFields.a.b, PrintableMixin.a.b):
+        pass
+
+    assert generated_code(Mixed)['__repr__'].co_filename == '<fields-mixin {0}.{1}>'.format(
+        __name__, Mixed.__qualname__
+    )
+
+
+def test_super_calls():
+    class Point(Fields.x.y):
+        def __repr__(self):
+            return '<' + super(Point, self).__repr__() + '>'
+
+        def __eq__(self, other):
+            return super(Point, self).__eq__(other) is True
+
+    class Pair(Tuple.a.b):
+        def __repr__(self):
+            return '<' + super(Pair, self).__repr__() + '>'
+
+    class Converted(ConvertibleFields.a.b):
+        @property
+        def as_dict(self):
+            return dict(super(Converted, self).as_dict, extra=True)
+
+    assert repr(Point(1, 2)) == '<Point(x=1, y=2)>'
+    assert Point(1, 2) == Point(1, 2)
+    assert not Point(1, 2) == Point(1, 3)
+    assert Point(1, 2) < Point(1, 3)
+    assert repr(Pair(1, 2)) == '<Pair(a=1, b=2)>'
+    assert Converted(1, 2).as_dict == {'a': 1, 'b': 2, 'extra': True}
+    assert Converted(1, 2).as_tuple == (1, 2)
+
+
+def test_sealer_pipeline():
+    def sealer(fields, defaults):
+        pipeline = SealerPipeline(fields)
+        global_namespace = pipeline.add_init(defaults, super_call=False)
+        pipeline.add_comparisons(fields[:1], ['__eq__', '__hash__'])
+        pipeline.add_repr()
+        pipeline.add_conversions(['as_tuple'])
+        pipeline.add('def total(self):\n    return __sum(({0}))\n'.format(pipeline.values('self')), ['total'],
+                     dict(__sum=sum))
+        methods = pipeline.compile()
+        assert list(methods) == ['__init__', '__eq__', '__hash__', '__repr__', 'as_tuple', 'total']
+        assert global_namespace is pipeline.global_namespace
+        return type('Base', (object,), methods)
+
+    class Point(factory(sealer).x.y[2]):
+        pass
+
+    point = Point(1)
+    assert repr(point) == 'Point(x=1, y=2)'
+    assert point.as_tuple == (1, 2)
+    assert point.total() == 3
+    assert point == Point(1, 5)
+    assert hash(point) == hash((1,))
+    assert generated_code(Point)['__init__'].co_filename == generated_code(Point)['total'].co_filename
+    assert generated_code(Point)['__eq__'].co_filename == generated_code(Point)['__hash__'].co_filename
+
+
+def test_regex_validator_generated():
+    class Test(RegexValidate.a['a+'].b['b+'], Fields.a.b):
+        pass
+
+    assert Test('aa', b='bb').b == 'bb'
+    assert 'Keyword argument \'b\'' in str(raises(ValidationError, Test, 'a', b='c').value)
+    assert 'Positional argument 1' in str(raises(ValidationError, Test, 'a', 'c').value)
+    assert 'fields-sealer' in generated_code(Test)['__init__'].co_filename
+
+
+@mark.skipif(sys.version_info < (3, 8), reason="Needs CodeType.replace")
+def test_generated_code_first_claim():
+    class First(Fields.a.b):
+        pass
+
+    # the sealed base of First is in the MRO again, it's not claimed by Second
+    class Second(First, PrintableMixin.a.b):
+        pass
+
+    assert generated_code(Second)['__init__'].co_filename.endswith('.{0}>'.format(First.__qualname__))
+    assert generated_code(Second)['__init__'] is generated_code(First)['__init__']
+
+    class Third(Fields.a.b):
+        pass
+
+    assert generated_code(Third)['__init__'].co_filename.endswith('.{0}>'.format(Third.__qualname__))
+
+
+@mark.skipif(sys.version_info < (3, 8), reason="Needs CodeType.replace")
+def test_generated_code_forgets_claims():
+    import linecache
+
+    from fields import _claimed_sources
+
+    def make_classes(prefix):
+        for i in range(500):
+            cls = type('{0}{1}'.format(prefix, i), (Fields.a.b,), {})
+            assert cls(1, 2) == cls(1, 2) and cls.from_dict({'a': 1, 'b': 2}) == cls(1, 2)
+
+    make_classes('First')
+    gc.collect()
+    entries, claimed = len(linecache.cache), len(_claimed_sources)
+    make_classes('Second')
+    gc.collect()
+    assert len(linecache.cache) <= entries
+    assert len(_claimed_sources) <= claimed
+
+    # same name and source, so the claimed filename is shared
+    Kept = type('Same', (Fields.a.b,), {})
+    Gone = type('Same', (Fields.a.b,), {})
+    filename = generated_code(Kept)['__init__'].co_filename
+    assert generated_code(Gone)['__init__'].co_filename == filename
+    del Gone
+    gc.collect()
+    assert 'self.a = a' in inspect.getsource(Kept.__init__)
+    assert filename in linecache.cache
+
+
+@fixture
+def event_loop():
+    asyncio = importorskip('asyncio')
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@fixture
+def serve(event_loop):
+    """
+    Returns a function that starts a local server sending ``payload`` and returns a ``StreamReader`` connected to it.
+    """
+    import asyncio
+
+    servers = []
+
+    def serve(payload):
+        def handle(reader, writer):
+            writer.write(payload)
+            writer.close()
+
+        server = event_loop.run_until_complete(asyncio.start_server(handle, '127.0.0.1', 0))
+        servers.append(server)
+        host, port = server.sockets[0].getsockname()[:2]
+        reader, _ = event_loop.run_until_complete(asyncio.open_connection(host, port))
+        return reader
+
+    yield serve
+    for server in servers:
+        server.close()
+        event_loop.run_until_complete(server.wait_closed())
+
+
+def collect(event_loop, iterator):
+    items = []
+    while True:
+        try:
+            items.append(event_loop.run_until_complete(iterator.__anext__()))
+        except StopAsyncIteration:
+            return items
+
+
+@mark.skipif(sys.version_info < (3, 6), reason="Needs async generators")
+def test_aiter_from_stream_ndjson(event_loop, serve, record_impl):
+    class Point(record_impl.x.y[0]):
+        pass
+
+    lines = ['{"x": %s, "y": %s}' % (i, -i) for i in range(2000)] + ['[1]', '', '{"x": 5}']
+    reader = serve('\n'.join(lines).encode())
+    records = collect(event_loop, Point.aiter_from_stream(reader, chunk_size=1000))
+    assert len(records) == 2002
+    assert records[:2] == [Point(0, 0), Point(1, -1)]
+    assert records[-2:] == [Point(1), Point(5)]
+
+
+@mark.skipif(sys.version_info < (3, 6), reason="Needs async generators")
+def test_aiter_from_stream_ndjson_extra_keys(event_loop, serve, record_impl):
+    class Point(record_impl.x.y[0]):
+        pass
+
+    data = b'{"x": 1, "z": 2}\n{"x": 3}\n'
+    mixed = b'{"x": 1, "z": 2}\n[3, 4]\n'
+    assert collect(event_loop, Point.aiter_from_stream(serve(data))) == [Point(1), Point(3)]
+    assert collect(event_loop, Point.aiter_from_stream(serve(mixed))) == [Point(1), Point(3, 4)]
+    for chunk in data, mixed:
+        raises(TypeError, collect, event_loop, Point.aiter_from_stream(serve(chunk), ignore_extra=False))
+
+
+@mark.skipif(sys.version_info < (3, 6), reason="Needs async generators")
+def test_aiter_from_stream_binary(event_loop, serve):
+    import struct
+
+    from fields.streams import aiter_batches
+
+    class Point(SlotsFields.x.y):
+        pass
+
+    payload = b''.join(struct.pack('!I', 16) + struct.pack('<qd', i, i / 2.0) for i in range(1000))
+    batches = collect(event_loop, aiter_batches(
+        Point, serve(payload), 'binary', chunk_size=100, types={'x': int, 'y': float}
+    ))
+    assert 1 < len(batches) < 1000
+    records = [record for batch in batches for record in batch]
+    assert records[:3] == [Point(0, 0.0), Point(1, 0.5), Point(2, 1.0)]
+    assert len(records) == 1000
+
+    reader = serve(struct.pack('!I', 3) + b'a,b' + struct.pack('!I', 4) + b'x,yy')
+    records = collect(event_loop, Point.aiter_from_stream(
+        reader, 'binary', decode=lambda payload: Point(*payload.decode().split(','))
+    ))
+    assert records == [Point('a', 'b'), Point('x', 'yy')]
+
+
+@mark.skipif(sys.version_info < (3, 6), reason="Needs async generators")
+def test_aiter_from_stream_errors(event_loop, serve):
+    import asyncio
+    import struct
+
+    class Point(Fields.x.y):
+        pass
+
+    reader = serve(struct.pack('!I', 16) + b'short')
+    raises(asyncio.IncompleteReadError, collect, event_loop, Point.aiter_from_stream(reader, 'binary', decode=bytes))
+    reader = serve(b'{"x": 1, "y": 2}' * 100)
+    raises(ValueError, collect, event_loop, Point.aiter_from_stream(reader, max_record_size=100))
+    raises(TypeError, collect, event_loop, Point.aiter_from_stream(serve(b''), 'xml'))
+
+
+@mark.skipif(sys.version_info < (3, 6), reason="Needs async generators")
+def test_aiter_from_stream_backpressure(event_loop):
+    import asyncio
+
+    reads = []
+
+    class Reader(asyncio.StreamReader):
+        def read(self, n=-1):
+            reads.append(n)
+            return super(Reader, self).read(n)
+
+    class Point(Fields.x.y):
+        pass
+
+    reader = Reader(loop=event_loop)
+    reader.feed_data(b'[1, 2]\n' * 1000)
+    reader.feed_eof()
+    iterator = Point.aiter_from_stream(reader, chunk_size=70)
+    assert event_loop.run_until_complete(iterator.__anext__()) == Point(1, 2)
+    assert reads == [70]
+    for _ in range(9):
+        event_loop.run_until_complete(iterator.__anext__())
+    assert reads == [70]
+    event_loop.run_until_complete(iterator.__anext__())
+    assert reads == [70, 70]
+
+
+@mark.skipif(sys.version_info < (3, 6), reason="Needs async generators")
+def test_aiter_from_stream_large_records(event_loop):
+    import asyncio
+    import struct
+
+    reads = []
+
+    class Reader(asyncio.StreamReader):
+        def read(self, n=-1):
+            reads.append(n)
+            return super(Reader, self).read(n)
+
+    class Point(Fields.x.y):
+        pass
+
+    def records(data, *args, **kwargs):
+        del reads[:]
+        reader = Reader(loop=event_loop)
+        reader.feed_data(data)
+        reader.feed_eof()
+        return collect(event_loop, Point.aiter_from_stream(reader, *args, **kwargs))
+
+    padding = ' ' * 100000
+    data = b'[1, 2]\n{"x": 3, "y": "%s"}\n[4, 5]\n[6, 7]' % padding.encode()
+    assert records(data, chunk_size=100) == [Point(1, 2), Point(3, padding), Point(4, 5), Point(6, 7)]
+    assert records(data, chunk_size=100, max_record_size=len(data)) == records(data, chunk_size=100000)
+
+    frame = struct.pack('!I', 100000) + b'x' * 100000
+    data = struct.pack('!I', 1) + b'a' + frame + struct.pack('!I', 1) + b'b'
+    assert records(data, 'binary', chunk_size=100, decode=len) == [1, 100000, 1]
+    # the rest of the large frame is read at once
+    assert len(reads) == 4
+    raises(asyncio.IncompleteReadError, records, data[:-1], 'binary', chunk_size=100, decode=len)
+    raises(asyncio.IncompleteReadError, records, data[:50000], 'binary', chunk_size=100, decode=len)
+    raises(ValueError, records, data, 'binary', chunk_size=3, max_record_size=1000, decode=len)
+
+
+@fixture(params=[class_sealer, slots_class_sealer], ids=['class', 'slots'])
+def tracking_impl(request):
+    return factory(request.param, tracking=True)
+
+
+def test_tracking(tracking_impl):
+    class Record(tracking_impl.a.b.c[3]):
+        pass
+
+    record = Record(1, 2)
+    assert record.changed_fields() == ()
+    record.c = 4
+    record.a = 0
+    assert record.changed_fields() == ('a', 'c')
+    assert record.diff(Record(1, 2)) == {'a': 0, 'c': 4}
+    assert record.diff(Record(0, 2, 4)) == {}
+    record.clear_changes()
+    assert record.changed_fields() == ()
+    record.b = 2
+    assert record.changed_fields() == ('b',)
+    assert record == Record(0, 2, 4)
+    assert Record.from_dict({'a': 1, 'b': 2}).changed_fields() == ()
+
+
+def test_tracking_pickle(tracking_impl):
+    class Record(tracking_impl.a.b):
+        pass
+
+    record = Record(1, 2)
+    record.b = 3
+    copy = pickle.loads(pickle.dumps(record, protocol=2))
+    assert copy == record
+    assert copy.changed_fields() == ()
+
+
+def test_tracking_inheritance():
+    tracking_inheritable = factory(class_sealer, base=object, pass_kwargs=True, flatten_init=True, tracking=True)
+
+    class A(tracking_inheritable.name):
+        pass
+
+    class B(tracking_inheritable.age[0]):
+        pass
+
+    class C(A, B):
+        pass
+
+    person = C('alice', age=30)
+    assert person.changed_fields() == ()
+    person.age = 31
+    assert person.changed_fields() == ('age',)
+    person.name = 'bob'
+    assert person.changed_fields() == ('name', 'age')
+    assert person.diff(C('bob', age=30)) == {'age': 31}
+    assert A('x').changed_fields() == ()
+
+
+def test_tracking_extra_attributes():
+    class Record(factory(class_sealer, tracking=True).a):
+        pass
+
+    record = Record(1)
+    record.other = 2
+    assert record.changed_fields() == ()
+    assert record.other == 2
+
+
+@fixture(params=[class_sealer, slots_class_sealer, tuple_sealer], ids=['class', 'slots', 'tuple'])
+def gc_untrack_impl(request):
+    return factory(request.param, gc_untrack=True)
+
+
+@mark.skipif(hasattr(sys, 'pypy_version_info'), reason="CPython only")
+def test_gc_untrack(gc_untrack_impl):
+    class Record(gc_untrack_impl.a.b[None]):
+        pass
+
+    assert not gc.is_tracked(Record(1, 'x'))
+    assert not gc.is_tracked(Record(1.5, b'x'))
+    assert not gc.is_tracked(Record(2 ** 70))
+    assert gc.is_tracked(Record(1, []))
+    assert gc.is_tracked(Record((), 1))
+    assert Record(1, 'x') == Record(1, 'x')
+
+    record = Record(1, 'x')
+    if issubclass(Record, tuple):
+        record.extra = 2
+        assert not gc.is_tracked(record)
+        record.extra = {}
+        assert gc.is_tracked(record)
+    else:
+        record.b = 2
+        assert not gc.is_tracked(record)
+        record.b = {}
+        assert gc.is_tracked(record)
+
+
+@mark.skipif(hasattr(sys, 'pypy_version_info'), reason="CPython only")
+def test_gc_untrack_extra_attributes():
+    class Record(factory(class_sealer, gc_untrack=True).a):
+        def __init__(self, a, extra):
+            self.extra = extra
+            super(Record, self).__init__(a)
+
+    assert not gc.is_tracked(Record(1, 2))
+    assert gc.is_tracked(Record(1, [2]))
+
+    class SlotsRecord(factory(slots_class_sealer, gc_untrack=True).a):
+        __slots__ = 'extra', '__private'
+
+        def __init__(self, a, extra):
+            self.extra = extra
+            self.__private = 1
+            super(SlotsRecord, self).__init__(a)
+
+    assert not gc.is_tracked(SlotsRecord(1, 2))
+    assert gc.is_tracked(SlotsRecord(1, [2]))
+
+
+@mark.skipif(hasattr(sys, 'pypy_version_info'), reason="CPython only")
+def test_gc_untrack_flat_init():
+    untracked_inheritable = factory(class_sealer, base=object, pass_kwargs=True, flatten_init=True, gc_untrack=True)
+
+    class A(untracked_inheritable.name):
+        pass
+
+    class B(untracked_inheritable.age[0]):
+        pass
+
+    class C(A, B):
+        pass
+
+    assert not gc.is_tracked(C('alice', age=30))
+    assert gc.is_tracked(C('alice', age=[30]))
+    assert gc.is_tracked(C(['alice'], age=30))
+
+
+@mark.skipif(sys.version_info < (3, 6), reason="Needs hashlib.blake2b")
+def test_stable_hash(record_impl):
+    from fields.sharding import fingerprint
+    from fields.sharding import stable_hash
+
+    class Point(record_impl.x.y):
+        pass
+
+    point = Point(1, 'a')
+    assert point.stable_hash() == stable_hash(point) == 4256521621400173379
+    assert point.fingerprint() == fingerprint(point)
+    assert len(point.fingerprint()) == 16
+    assert Point(1.0, 'a').stable_hash() == Point(True, 'a').stable_hash() == point.stable_hash()
+    assert Point(1, 'b').stable_hash() != point.stable_hash()
+    assert Point(None, 0.5).stable_hash() != Point(None, 1.5).stable_hash()
+    assert Point([1, 2], 'a').stable_hash() != Point((1, 2), 'a').stable_hash()
+    assert Point({'a': {1, 2}}, b'x').stable_hash() == Point({'a': frozenset([2, 1])}, b'x').stable_hash()
+    assert Point(point, None).stable_hash() == Point(Point(1, 'a'), None).stable_hash()
+    raises(TypeError, Point(object(), 1).stable_hash)
+
+
+@mark.skipif(sys.version_info < (3, 6), reason="Needs hashlib.blake2b")
+def test_stable_hash_other_process():
+    from fields.sharding import stable_hash
+
+    output = subprocess.check_output(
+        [sys.executable, '-c', 'from fields.sharding import stable_hash; print(stable_hash(("x", 1.5, None)))'],
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path), PYTHONHASHSEED='123'),
+    )
+    assert int(output) == stable_hash(('x', 1.5, None))
+
+
+@mark.skipif(sys.version_info < (3, 6), reason="Needs hashlib.blake2b")
+def test_partition():
+    from operator import attrgetter
+
+    from fields.sharding import partition
+
+    class Event(Tuple.user.value):
+        pass
+
+    events = [Event(i % 10, i) for i in range(1000)]
+    shards = partition(events, 3)
+    assert len(shards) == 3
+    assert sorted(event.value for shard in shards for event in shard) == list(range(1000))
+    assert partition(events, 3) == shards
+    by_user = partition(events, 4, key=attrgetter('user'))
+    for shard in by_user:
+        for user in set(event.user for event in shard):
+            assert all(event in shard for event in events if event.user == user)
+    raises(ValueError, partition, events, 0)
+
+
+@mark.skipif(sys.version_info < (3, 5), reason="Needs heapq.merge(key=...)")
+def test_external_sort(record_impl, tmpdir):
+    from fields.extsort import external_sort
+
+    class Event(record_impl.user.time):
+        pass
+
+    events = [Event(i % 7, (i * 37) % 101) for i in range(1000)]
+    expected = sorted(events, key=lambda event: (event.user, event.time))
+    assert list(external_sort(iter(events), fields=['user', 'time'], max_records=64, tmpdir=str(tmpdir))) == expected
+    assert list(external_sort(events, fields=['user', 'time'], max_records=5000)) == expected
+    assert list(external_sort(events, key=lambda event: event.time, reverse=True, max_records=100)) == sorted(
+        events, key=lambda event: event.time, reverse=True
+    )
+    assert list(external_sort(events, fields=['user'], max_memory=1000)) == sorted(events, key=lambda event: event.user)
+    assert list(external_sort([], fields=['user'])) == []
+    assert tmpdir.listdir() == []
+    raises(TypeError, external_sort, events, key=len, fields=['user'])
+    raises(ValueError, external_sort, events, max_records=0)
+
+
+@mark.skipif(sys.version_info < (3, 5), reason="Needs heapq.merge(key=...)")
+def test_external_sort_stable():
+    from fields.extsort import external_sort
+
+    class Event(Tuple.user.time):
+        pass
+
+    class Other(Fields.user.time):
+        pass
+
+    def user(item):
+        return item[0] if type(item) is tuple else item.user
+
+    events = [Event(i % 3, i) for i in range(100)] + [Other(i % 3, -i) for i in range(100)] + [(1, 'x'), (0, 'y')]
+    result = list(external_sort(events, key=user, max_records=7))
+    assert result == sorted(events, key=user)
+    assert [type(item) for item in result[:3]] == [Event, Event, Event]
+    sorter = external_sort(events, key=user, max_records=7)
+    assert next(sorter) is not None
+    sorter.close()
+
+
+@mark.skipif(sys.version_info < (3, 5), reason="Needs heapq.merge(key=...)")
+def test_external_sort_no_constructor():
+    from fields.extsort import external_sort
+
+    for impl in Fields, SlotsFields:
+        class Scaled(impl.user.time):
+            def __init__(self, user, time):
+                super(Scaled, self).__init__(user, time * 10)
+
+        events = [Scaled(i % 3, i) for i in range(20)]
+        assert [event.time for event in external_sort(events, fields=['user'], max_records=3)] == [
+            event.time for event in sorted(events, key=lambda event: event.user)
+        ]
+
+    class A(InheritableFields.name.nick[None]):
+        pass
+
+    class B(InheritableFields.age.score[0]):
+        pass
+
+    class Person(A, B):
+        pass
+
+    people = [Person('p%s' % i, age=i % 5) for i in range(20)]
+    assert [vars(person) for person in external_sort(people, fields=['age'], max_records=3)] == [
+        vars(person) for person in sorted(people, key=lambda person: person.age)
+    ]
+
+    tagged = [G4(i % 3, i) for i in range(20)]
+    assert [vars(event) for event in external_sort(tagged, fields=['user'], max_records=3)] == [
+        vars(event) for event in sorted(tagged, key=lambda event: event.user)
+    ]
+
+
+def test_lazy_layout(record_impl):
+    import pickle as pickle_module
+
+    from fields.lazy import LazyLayout
+
+    class Event(record_impl.user.kind.payload):
+        pass
+
+    layout = LazyLayout.of(Event)
+    assert LazyLayout.of(Event) is layout
+    record = Event('alice', u'cl\xefck', {'x': [1, 2, None]})
+    blob = layout.pack(record)
+    assert layout.unpack(blob) == record
+    view = layout.view(blob)
+    assert vars(view) == {}
+    assert view.kind == u'cl\xefck'
+    assert vars(view) == {'kind': u'cl\xefck'}
+    assert view.payload is view.payload
+    assert view == record
+    assert view != Event('bob', 'click', None)
+    assert repr(view) == repr(record)
+    assert view.as_record() == record
+    view.user = 'bob'
+    assert view.as_record() == Event('bob', u'cl\xefck', {'x': [1, 2, None]})
+    assert layout.view(memoryview(blob)).payload == {'x': [1, 2, None]}
+
+    class Pair(Tuple.a.b):
+        pass
+
+    other = LazyLayout.of(Pair).pack(Pair(1, 2))
+    raises(ValueError, layout.view, other)
+    raises(ValueError, layout.unpack, other)
+    raises(ValueError, getattr, layout.view(blob.replace(b'"alice"', b'{alice}')), 'user')
+
+    pickled = LazyLayout(Event, pickle_module.dumps, pickle_module.loads)
+    record = Event({1, 2}, b'raw', None)
+    assert pickled.view(pickled.pack(record)).user == {1, 2}
+    assert pickled.unpack(pickled.pack(record)) == record
+
+
+def test_lazy_layout_collected():
+    import weakref
+
+    from fields.lazy import LazyLayout
+
+    Event = type('Event', (Fields.user.kind,), {})
+    layout = LazyLayout.of(Event)
+    assert LazyLayout.of(Event) is layout
+    assert layout.view(layout.pack(Event('alice', 'click'))) == Event('alice', 'click')
+    ref = weakref.ref(Event)
+    del Event, layout
+    gc.collect()
+    assert ref() is None
+
+
+def test_ctypes_sealer():
+    import copy
+    import ctypes
+
+    from fields import structs
+
+    assert StructFields is structs.StructFields
+    assert ctypes_sealer is structs.ctypes_sealer
+
+    class Point(StructFields.x.y.z[0]):
+        __annotations__ = {'x': float, 'y': ctypes.c_int32, 'z': bool}
+
+    point = Point(1.5, 2)
+    assert repr(point) == 'Point(x=1.5, y=2, z=False)'
+    assert point == Point(1.5, y=2, z=0)
+    assert point < Point(2, 0)
+    assert hash(point) == hash(Point(1.5, 2))
+    assert ctypes.sizeof(Point) == 16
+    assert bytes(point) == bytes(memoryview(point))
+    assert Point.from_buffer_copy(bytes(point)) == point
+    assert copy.copy(point) == point
+    assert copy.deepcopy(point) is not point
+    view = memoryview(point)
+    point.y = 7
+    assert Point.from_buffer_copy(view.tobytes()).y == 7
+    raises(AttributeError, setattr, point, 'other', 1)
+    raises(TypeError, Point, 'a', 1)
+    assert Point.from_dict({'x': 1, 'y': 2}) == Point(1, 2)
+
+    class Point3D(Point):
+        pass
+    assert Point3D(1, 2, True) == Point3D(1.0, 2, 1)
+    assert ctypes.sizeof(Point3D) == 16
+
+
+def test_ctypes_sealer_types():
+    import ctypes
+
+    Record = factory(ctypes_sealer, types={'id': int, 'name': ctypes.c_char * 8})
+
+    class User(Record.id.name[b'']):
+        pass
+
+    assert User(1, b'alice').name == b'alice'
+    assert User(2).name == b''
+    assert bytes(User(3, b'bob')) == b'\x03' + b'\x00' * 7 + b'bob' + b'\x00' * 5
+
+    user = User(2 ** 63 - 1)
+    assert user.id == 2 ** 63 - 1 and User(-2 ** 63).id == -2 ** 63
+    raises(OverflowError, User, 2 ** 63)
+    raises(OverflowError, User, 2 ** 64 + 5)
+    raises(OverflowError, setattr, user, 'id', -2 ** 63 - 1)
+    raises(TypeError, setattr, user, 'id', 'a')
+    assert user.id == 2 ** 63 - 1
+
+    class Small(StructFields.a):
+        __annotations__ = {'a': ctypes.c_uint8}
+
+    # explicit ctypes types wrap around
+    assert Small(256).a == 0 and Small(-1).a == 255
+
+    def missing_type():
+        class Bad(StructFields.a.b):
+            __annotations__ = {'a': int}
+    raises(TypeError, missing_type)
+
+    def bad_type():
+        class Bad(StructFields.a):
+            __annotations__ = {'a': str}
+    raises(TypeError, bad_type)
+
+
+@fixture(params=[Fields, SlotsFields, factory(class_sealer, gc_untrack=True),
+                 factory(slots_class_sealer, tracking=True, gc_untrack=True)],
+         ids=['class', 'slots', 'class-gc', 'slots-tracking-gc'])
+def computed_impl(request):
+    return request.param
+
+
+def test_computed(computed_impl):
+    calls = []
+
+    def initials(self):
+        calls.append(self)
+        return self.first[0] + self.last[0]
+
+    class Person(computed_impl.first.last.age[0].initials[computed(initials, 'first', 'last')].name[
+        computed(lambda self: '%s %s' % (self.first, self.last))
+    ]):
+        pass
+
+    person = Person('John', 'Smith')
+    assert Person.__fields__ == ('first', 'last', 'age')
+    assert repr(person) == "Person(first='John', last='Smith', age=0)"
+    assert person == Person('John', 'Smith', 0)
+    assert person.initials == 'JS'
+    assert person.initials == 'JS'
+    assert len(calls) == 1
+    person.age = 30
+    assert person.initials == 'JS'
+    assert len(calls) == 1
+    person.last = 'Doe'
+    assert person.initials == 'JD'
+    assert person.name == 'John Doe'
+    assert len(calls) == 2
+    raises(AttributeError, setattr, person, 'initials', 'XX')
+    raises(TypeError, Person, 'John', 'Smith', 30, 'JS')
+    assert Person.from_dict({'first': 'Ann', 'last': 'Lee'}).name == 'Ann Lee'
+    if '__slots__' in Person.__dict__:
+        raises(AttributeError, setattr, person, 'other', 1)
+
+
+def test_computed_pickle():
+    person = ComputedPerson('John', 'Smith')
+    assert person.name == 'John Smith'
+    clone = pickle.loads(pickle.dumps(person))
+    assert clone.name == 'John Smith'
+    clone.first = 'Jane'
+    assert clone.name == 'Jane Smith'
+
+
+def test_computed_errors():
+    def unknown_source():
+        class Bad(Fields.a.b[computed(len, 'c')]):
+            pass
+    raises(TypeError, unknown_source)
+
+    def tuple_computed():
+        class Bad(Tuple.a.b[computed(len)]):
+            pass
+    raises(TypeError, tuple_computed)
+    assert repr(computed(len, 'a')) == "computed(<built-in function len>, 'a')"
+
+
+def full_name(person):
+    return '%s %s' % (person.first, person.last)
+
+
+class ComputedPerson(SlotsFields.first.last.name[computed(full_name)]):
+    pass
+
+
+@mark.parametrize('sealer', [class_sealer, slots_class_sealer, tuple_sealer])
+def test_key_fields(sealer):
+    class Document(factory(sealer, key_fields=['kind', 'id']).kind.id.body):
+        pass
+
+    first = Document('page', 1, ['a'] * 100)
+    assert first == Document('page', 1, None)
+    assert not first != Document('page', 1, None)
+    assert first != Document('page', 2, ['a'] * 100)
+    assert hash(first) == hash(Document('page', 1, {}))
+    assert len(set([first, Document('page', 1, None), Document('note', 1, None)])) == 2
+    assert first < Document('page', 2, None) <= Document('page', 2, []) < Document('post', 0, None)
+    assert Document('post', 0, None) > first >= Document('page', 1, 'other')
+    assert first.__eq__(('page', 1, None)) is NotImplemented
+    assert repr(first) == "Document(kind='page', id=1, body=%r)" % (['a'] * 100,)
+    assert '__hash__' in generated_code(Document)
+
+
+def test_key_fields_mixin():
+    KeyedMixin = factory(class_sealer, initializer=False, base=object, printable=False, key_fields='id')
+
+    class Record(KeyedMixin.id, Tuple.id.payload):
+        pass
+
+    assert Record(1, 'a') == Record(1, 'b')
+    assert Record(1, 'a') < Record(2, 'a')
+    assert hash(Record(1, 'a')) == hash(Record(1, 'b'))
+    assert 'self[0]' in ''.join(inspect.getsource(Record.__eq__))
+
+
+def test_key_fields_invalid():
+    for key_fields in (['nope'], [], 'other'):
+        def seal():
+            class Bad(factory(class_sealer, key_fields=key_fields).a.b):
+                pass
+        raises(TypeError, seal)
+
+
+def test_csv(record_impl):
+    import io
+
+    class Person(record_impl.name.age.city['?']):
+        pass
+
+    people = [Person('alice', 30, 'Paris'), Person('bob, jr', 40, 'New\nYork'), Person(u'\xe9mile', 50)]
+    data = io.StringIO()
+    Person.write_csv(data, people)
+    data.seek(0)
+    assert list(Person.read_csv(data, converters={'age': int}, chunksize=2)) == people
+    data.seek(0)
+    assert next(Person.read_csv(data)) == Person('alice', '30', 'Paris')
+
+    source = io.StringIO(u'id;age;name\n1;31;carol\n\n2;32;dave\n')
+    assert list(Person.read_csv(source, delimiter=';', converters={'age': int})) == [
+        Person('carol', 31), Person('dave', 32)
+    ]
+    assert list(Person.read_csv(io.StringIO(u'eve,20,Rome\n'), header=False)) == [Person('eve', '20', 'Rome')]
+    assert list(Person.read_csv(io.StringIO(u'20,eve\n'), header=['age', 'name'])) == [Person('eve', '20')]
+    assert list(Person.read_csv(io.StringIO(u''))) == []
+    raises(TypeError, list, Person.read_csv(io.StringIO(u'name\nx\n')))
+    raises(TypeError, list, Person.read_csv(io.StringIO(u'name,age\nx,1\n'), converters={'nope': int}))
+
+    data = io.StringIO()
+    Person.write_csv(data, people[:1], header=False, delimiter='|')
+    assert data.getvalue() == u'alice|30|Paris\r\n'
+
+
+def test_csv_single_field():
+    import io
+
+    class Name(Fields.name):
+        pass
+
+    data = io.StringIO()
+    Name.write_csv(data, [Name('a'), Name('b')])
+    data.seek(0)
+    assert list(Name.read_csv(data)) == [Name('a'), Name('b')]
+
+
+def test_to_json(record_impl):
+    import io
+    import json
+
+    from fields.jsonio import dump_many
+    from fields.jsonio import dumps
+
+    class Point(record_impl.x.y):
+        pass
+
+    class Event(Fields.name.point.tags[()]):
+        pass
+
+    def default(value):
+        return dict((name, getattr(value, name)) for name in type(value).__fields__)
+
+    events = [
+        Event(u'caf\xe9 "quoted"\n', Point(1, -2.5)),
+        Event(None, Point(True, False), [Point(10 ** 20, float('inf'))]),
+        Event(0.1, Point(float('nan'), {'a': [1, None]})),
+    ]
+    for event in events:
+        assert event.to_json() == json.dumps(dict(name=event.name, point=event.point, tags=event.tags), default=default)
+    assert Point(1, 'a').to_json() == '{"x": 1, "y": "a"}'
+    raises(TypeError, Point(1, object()).to_json)
+
+    data = io.StringIO()
+    dump_many(events, data, chunksize=2)
+    assert data.getvalue().splitlines() == [event.to_json() for event in events]
+    data = io.StringIO()
+    dump_many(events + [Point(1, 2)], data, lines=False, chunksize=2)
+    assert json.loads(data.getvalue(), parse_constant=str) == [
+        json.loads(dumps(record), parse_constant=str) for record in events + [Point(1, 2)]
+    ]
+    data = io.StringIO()
+    dump_many([], data, lines=False)
+    assert data.getvalue() == '[]'
+
+
+class ShapedRow(ShapedNamespace):
+    __slots__ = ()
+
+
+def test_shaped_namespace():
+    from fields import namespaces
+
+    assert ShapedNamespace is namespaces.ShapedNamespace
+    row = ShapedNamespace(b=2, a=1)
+    assert repr(row) == 'ShapedNamespace(a=1, b=2)'
+    assert type(row) is type(ShapedNamespace(a=3, b=4))
+    assert type(row) is not type(ShapedNamespace(a=3))
+    assert isinstance(row, ShapedNamespace)
+    assert not hasattr(row, '__weakref__')
+    assert vars(row) == {'a': 1, 'b': 2}
+    assert row == ShapedNamespace(a=1, b=2) == Namespace(a=1, b=2)
+    assert Namespace(a=1, b=2) == row
+    assert row != ShapedNamespace(a=1, b=3)
+    assert row != ShapedNamespace(a=1)
+    raises(TypeError, hash, row)
+    row.a = 10
+    assert row.a == 10
+    raises(AttributeError, setattr, row, 'c', 3)
+    assert repr(ShapedNamespace()) == 'ShapedNamespace()'
+
+    # shapes that fall out of the LRU are still shared while they have instances
+    for i in range(300):
+        ShapedNamespace(**{'field%s' % i: i})
+    assert type(ShapedNamespace(b=0, a=0)) is type(row)
+
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        assert pickle.loads(pickle.dumps(row, protocol)) == row
+        other = pickle.loads(pickle.dumps(ShapedRow(x=1), protocol))
+        assert isinstance(other, ShapedRow)
+        assert repr(other) == 'ShapedRow(x=1)'
+
+
+def test_shaped_namespace_other_names():
+    for attributes in dict(super=1), {'a-b': 1}, dict(cls=1, x=2), dict(self=1), {'__x': 1, 'class': 2}:
+        row = ShapedNamespace(**attributes)
+        assert vars(row) == attributes
+        assert isinstance(row, ShapedNamespace)
+        assert type(row) is type(ShapedNamespace(**attributes))
+        assert row == ShapedNamespace(**attributes)
+        if 'self' not in attributes:  # Namespace can't have a "self" attribute
+            assert row == Namespace(**attributes)
+        assert row != ShapedNamespace(**dict(attributes, other=0))
+        assert pickle.loads(pickle.dumps(row)) == row
+        raises(TypeError, hash, row)
+    assert ShapedNamespace(super=1).super == 1
+    assert repr(ShapedNamespace(cls=1, x=2)) == 'ShapedNamespace(cls=1, x=2)'
+    assert repr(ShapedRow(cls=1)) == 'ShapedRow(cls=1)'
+
+
+def test_shaped_namespace_forgets_code():
+    import gc
+    import linecache
+
+    def make_shapes(prefix):
+        for i in range(300):
+            row = ShapedNamespace(**{'{0}{1}'.format(prefix, i): i})
+            assert row == row and repr(row)
+
+    make_shapes('first')
+    gc.collect()
+    entries = len(linecache.cache)
+    make_shapes('second')
+    gc.collect()
+    assert len(linecache.cache) <= entries
+
+
+def test_default_factory(record_impl):
+    class Node(record_impl.name.children[default_factory(list)].meta[None]):
+        pass
+
+    first, second = Node('a'), Node('b')
+    assert first.children == [] and first.children is not second.children
+    assert Node('c', [1]).children == [1]
+    assert Node('c', children=None).children is None
+    assert repr(first) == "Node(name='a', children=[], meta=None)"
+    assert Node.from_dict({'name': 'd'}).children == []
+    nodes = Node.from_dicts([{'name': 'e'}, {'name': 'f', 'children': [2]}])
+    assert [node.children for node in nodes] == [[], [2]]
+    assert nodes[0].children is not Node.from_dict({'name': 'g'}).children
+    assert 'children is __fields_missing' in inspect.getsource(Node.__new__ if issubclass(Node, tuple) else Node.__init__)
+    assert repr(default_factory(list)) == "default_factory(<class 'list'>)"
+
+
+def test_default_factory_flat_init():
+    class Named(InheritableFields.name.tags[default_factory(list)]):
+        pass
+
+    class Counted(InheritableFields.counts[default_factory(dict)]):
+        pass
+
+    class Item(Named, Counted):
+        pass
+
+    assert Item.__init__.__fields_flat__
+    first, second = Item('a'), Item('b', counts={'x': 1})
+    assert (first.tags, first.counts, second.counts) == ([], {}, {'x': 1})
+    assert first.tags is not second.tags
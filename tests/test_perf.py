@@ -1,5 +1,10 @@
+import gc
+import os
+import subprocess
+import sys
 from collections import namedtuple
 from functools import partial
+from operator import attrgetter
 
 import pytest
 from attr import Factory
@@ -9,19 +14,51 @@ from attr import s as badly_named_class_decorator
 from characteristic import Attribute
 from characteristic import attributes
 
+from fields import BareFields
+from fields import ComparableMixin
+from fields import ConvertibleFields
 from fields import Fields
+from fields import InheritableFields
+from fields import Namespace
+from fields import PrintableMixin
+from fields import ShapedNamespace
 from fields import SlotsFields
+from fields import StructFields
 from fields import Tuple
 from fields import __base__
 from fields import class_sealer
+from fields import computed
+from fields import default_factory
 from fields import factory
 from fields import make_init_func
+from fields import slots_class_sealer
+from fields import tuple_sealer
+from fields.lazy import LazyLayout
+from fields.recordset import RecordSet
 
 try:
     from cnamedtuple import namedtuple as cnamedtuple
 except ImportError:
     cnamedtuple = None
 
+try:
+    from fields.extsort import external_sort
+except SyntaxError:
+    external_sort = None
+
+try:
+    from fields.sharding import partition
+    from fields.sharding import stable_hash
+except ImportError:
+    partition = stable_hash = None
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+
+    from fields.sharedmem import SharedBatch
+except ImportError:
+    SharedBatch = None
+
 
 @attributes(["a", "b", Attribute("c", default_value="abc")])
 class characteristic_class(object):
@@ -87,6 +124,76 @@ else:
 attrs_class = make_class("attrs_class", ["a", "b", "c"])
 
 
+class inheritable_a(InheritableFields.a):
+    pass
+
+
+class inheritable_b(InheritableFields.b):
+    pass
+
+
+class inheritable_c(InheritableFields.c["abc"]):
+    pass
+
+
+class inheritable_class(inheritable_a, inheritable_b, inheritable_c):
+    pass
+
+
+ChainedFields = factory(class_sealer, base=object, pass_kwargs=True)
+
+
+class chained_a(ChainedFields.a):
+    pass
+
+
+class chained_b(ChainedFields.b):
+    pass
+
+
+class chained_c(ChainedFields.c["abc"]):
+    pass
+
+
+class chained_class(chained_a, chained_b, chained_c):
+    pass
+
+
+def test_inheritable_fields(benchmark):
+    assert benchmark(partial(inheritable_class, a=1, b=2, c=1))
+
+
+def test_inheritable_fields_chained(benchmark):
+    assert benchmark(partial(chained_class, a=1, b=2, c=1))
+
+
+record_dict = dict(a=1, b=2, c=1)
+
+
+def test_fields_kwargs_from_dict(benchmark):
+    assert benchmark(partial(fields_class, **record_dict))
+
+
+def test_fields_from_dict(benchmark):
+    assert benchmark(fields_class.from_dict, record_dict)
+
+
+def test_fields_from_dicts(benchmark):
+    assert benchmark(fields_class.from_dicts, [record_dict] * 1000)
+
+
+def test_fields_kwargs_from_dicts(benchmark):
+    assert benchmark(lambda dicts: [fields_class(**d) for d in dicts], [record_dict] * 1000)
+
+
+def test_slots_fields_from_dict(benchmark):
+    assert benchmark(slots_class.from_dict, record_dict)
+
+
+def test_tuple_from_dict(benchmark):
+    assert benchmark(tuple_class.from_dict, record_dict)
+
+
 def test_characteristic(benchmark):
     assert benchmark(partial(characteristic_class, a=1, b=2, c=1))
 
@@ -129,3 +236,500 @@ def test_attrs_decorated_class(benchmark):
 
 def test_attrs_class(benchmark):
     assert benchmark(partial(attrs_class, a=1, b=2, c=1))
+
+
+class numeric_class(SlotsFields.x.y.z):
+    pass
+
+
+numeric_types = dict(x=float, y=float, z=int)
+numeric_records = [numeric_class(i * 0.5, i * 1.5, i) for i in range(100000)]
+numeric_chunks = 8
+
+
+def sum_records(records):
+    return sum(record.z for record in records)
+
+
+def sum_shared_records(name, start, stop):
+    batch = SharedBatch.attach(numeric_class, name, numeric_types)
+    try:
+        return sum(batch[i].z for i in range(start, stop))
+    finally:
+        batch.close()
+
+
+@pytest.fixture(scope="module")
+def process_pool():
+    if SharedBatch is None:
+        pytest.skip("Not available.")
+    with ProcessPoolExecutor(numeric_chunks) as pool:
+        yield pool
+
+
+def test_process_pool_pickle(benchmark, process_pool):
+    step = len(numeric_records) // numeric_chunks
+
+    def run():
+        return sum(process_pool.map(sum_records, [
+            numeric_records[start:start + step] for start in range(0, len(numeric_records), step)
+        ]))
+
+    assert benchmark(run) == sum_records(numeric_records)
+
+
+def test_process_pool_shared_memory(benchmark, process_pool):
+    step = len(numeric_records) // numeric_chunks
+
+    def run():
+        with SharedBatch.create(numeric_class, numeric_records, numeric_types) as batch:
+            try:
+                return sum(process_pool.map(sum_shared_records, *zip(*[
+                    (batch.name, start, start + step) for start in range(0, len(numeric_records), step)
+                ])))
+            finally:
+                batch.unlink()
+
+    assert benchmark(run) == sum_records(numeric_records)
+
+
+@pytest.fixture(scope="module", params=[10000, 1000000], ids=["10k", "1M"])
+def recordset_records(request):
+    return [slots_class(i, i % 1000, i % 97) for i in range(request.param)]
+
+
+@pytest.fixture(scope="module")
+def recordset(recordset_records):
+    return RecordSet(slots_class, recordset_records, hash_indexes=["b", ("b", "c")], sorted_indexes=["a"])
+
+
+def test_recordset_lookup(benchmark, recordset):
+    assert benchmark(recordset.lookup, b=500)
+
+
+def test_linear_scan_lookup(benchmark, recordset_records):
+    assert benchmark(lambda: [record for record in recordset_records if record.b == 500])
+
+
+def test_recordset_lookup_two_fields(benchmark, recordset):
+    assert benchmark(recordset.lookup, b=500, c=15)
+
+
+def test_linear_scan_lookup_two_fields(benchmark, recordset_records):
+    assert benchmark(lambda: [record for record in recordset_records if record.b == 500 and record.c == 15])
+
+
+def test_recordset_range(benchmark, recordset):
+    assert benchmark(recordset.range, "a", 1000, 1100)
+
+
+def test_linear_scan_range(benchmark, recordset_records):
+    assert benchmark(lambda: sorted(
+        [record for record in recordset_records if 1000 <= record.a <= 1100], key=lambda record: record.a
+    ))
+
+
+def test_recordset_add_remove(benchmark, recordset):
+    record = slots_class(-1, 500, 15)
+
+    def run():
+        recordset.add(record)
+        recordset.remove(record)
+        return True
+
+    assert benchmark(run)
+
+
+class mixin_class(BareFields.a.b.c["abc"], ComparableMixin.a.b.c, PrintableMixin.a.b.c):
+    pass
+
+
+generic_mixin_eq = (~ComparableMixin.a.b.c).__dict__['__eq__']
+generic_mixin_repr = (~PrintableMixin.a.b.c).__dict__['__repr__']
+
+
+def test_mixin_eq_specialized(benchmark):
+    assert benchmark(mixin_class.__eq__, mixin_class(1, 2), mixin_class(1, 2))
+
+
+def test_mixin_eq_generic(benchmark):
+    assert benchmark(generic_mixin_eq, mixin_class(1, 2), mixin_class(1, 2))
+
+
+def test_mixin_repr_specialized(benchmark):
+    assert benchmark(mixin_class.__repr__, mixin_class(1, 2))
+
+
+def test_mixin_repr_generic(benchmark):
+    assert benchmark(generic_mixin_repr, mixin_class(1, 2))
+
+
+class tracked_class(factory(class_sealer, tracking=True).a.b.c["abc"]):
+    pass
+
+
+class tracked_slots_class(factory(slots_class_sealer, tracking=True).a.b.c["abc"]):
+    pass
+
+
+def assign(record):
+    record.a = 1
+    record.b = 2
+    record.c = 3
+    return record
+
+
+@pytest.mark.parametrize("record_class", [fields_class, tracked_class, slots_class, tracked_slots_class],
+                         ids=["plain", "tracked", "plain-slots", "tracked-slots"])
+def test_assignment(benchmark, record_class):
+    assert benchmark(assign, record_class(0, 0))
+
+
+def test_changed_fields(benchmark):
+    record = assign(tracked_class(0, 0))
+    assert benchmark(record.changed_fields) == ('a', 'b', 'c')
+
+
+class gc_untracked_slots_class(factory(slots_class_sealer, gc_untrack=True).a.b.c["abc"]):
+    pass
+
+
+class gc_untracked_tuple_class(factory(tuple_sealer, gc_untrack=True).a.b.c["abc"]):
+    pass
+
+
+@pytest.fixture(scope="module", params=[
+    slots_class, gc_untracked_slots_class, tuple_class, gc_untracked_tuple_class
+], ids=["slots", "slots-untracked", "tuple", "tuple-untracked"])
+def gc_heap(request):
+    return [request.param(i, i * 2) for i in range(300000)]
+
+
+def test_gc_collect(benchmark, gc_heap):
+    benchmark(gc.collect)
+
+
+def test_gc_tracked_objects():
+    for record_class, expected in [
+        (slots_class, 10000), (gc_untracked_slots_class, 0), (tuple_class, 10000), (gc_untracked_tuple_class, 0)
+    ]:
+        records = [record_class(i, i * 2) for i in range(10000)]
+        assert sum(map(gc.is_tracked, records)) == expected
+
+
+@pytest.mark.skipif(stable_hash is None, reason="Needs hashlib.blake2b")
+def test_stable_hash_generated(benchmark):
+    assert benchmark(tuple_class(123, "abc").stable_hash)
+
+
+@pytest.mark.skipif(stable_hash is None, reason="Needs hashlib.blake2b")
+def test_stable_hash_generic(benchmark):
+    assert benchmark(stable_hash, tuple_class(123, "abc"))
+
+
+@pytest.mark.skipif(stable_hash is None, reason="Needs hashlib.blake2b")
+def test_partition(benchmark):
+    records = [slots_class(i, str(i)) for i in range(10000)]
+    assert len(benchmark(partition, records, 8)) == 8
+
+
+@pytest.fixture(scope='module')
+def sort_input():
+    return [tuple_class(i % 1000, (i * 7919) % 200000) for i in range(200000)]
+
+
+@pytest.mark.skipif(external_sort is None, reason="Needs Python 3")
+@pytest.mark.parametrize('max_records', [20000, 200000])
+def test_external_sort(benchmark, sort_input, max_records):
+    def run():
+        return sum(1 for _ in external_sort(sort_input, fields=['a'], max_records=max_records))
+    assert benchmark(run) == len(sort_input)
+
+
+def test_external_sort_baseline(benchmark, sort_input):
+    key = attrgetter('a')
+    assert len(benchmark(sorted, sort_input, key=key)) == len(sort_input)
+
+
+class wide_class(SlotsFields.id.user.kind.tags.payload.source.created.updated.meta.extra):
+    pass
+
+
+@pytest.fixture(scope='module')
+def wide_records():
+    return [
+        wide_class(i, 'user%s' % (i % 10), 'click', ['a', 'b'], {'x': list(range(20))}, 'web', 1.5, 2.5, {'k': 'v'}, None)
+        for i in range(1000)
+    ]
+
+
+def test_filter_json(benchmark, wide_records):
+    import json
+
+    fields = wide_class.__fields__
+    payloads = [json.dumps(dict(zip(fields, attrgetter(*fields)(record)))).encode('utf-8') for record in wide_records]
+    loads = json.loads
+
+    def run():
+        return [record for record in (wide_class(**loads(payload)) for payload in payloads) if record.user == 'user1']
+    assert len(benchmark(run)) == 100
+
+
+def test_filter_lazy(benchmark, wide_records):
+    layout = LazyLayout.of(wide_class)
+    blobs = [layout.pack(record) for record in wide_records]
+    view = layout.view
+
+    def run():
+        return [record for record in map(view, blobs) if record.user == 'user1']
+    assert len(benchmark(run)) == 100
+
+
+class struct_class(StructFields.a.b.c[0.0]):
+    __annotations__ = {'a': float, 'b': float, 'c': float}
+
+
+def test_struct_fields(benchmark):
+    assert benchmark(partial(struct_class, a=1.5, b=2.5, c=3.5))
+
+
+def test_struct_fields_getattr(benchmark):
+    assert benchmark(attrgetter('a', 'b', 'c'), struct_class(1.5, 2.5, 3.5))
+
+
+def test_struct_fields_bytes(benchmark):
+    assert len(benchmark(bytes, struct_class(1.5, 2.5, 3.5))) == 24
+
+
+class wide_struct_class(StructFields.a.b.c.d.e.f.g.h):
+    __annotations__ = dict.fromkeys('abcdefgh', float)
+
+
+class wide_slots_class(SlotsFields.a.b.c.d.e.f.g.h):
+    pass
+
+
+def traced_memory(make_records):
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        records = make_records()
+        return tracemalloc.get_traced_memory()[0] / len(records)
+    finally:
+        tracemalloc.stop()
+
+
+def test_struct_memory():
+    struct_size = traced_memory(lambda: [wide_struct_class(*[i + j + 0.5 for j in range(8)]) for i in range(10000)])
+    slots_size = traced_memory(lambda: [wide_slots_class(*[i + j + 0.5 for j in range(8)]) for i in range(10000)])
+    assert struct_size < slots_size * 0.6
+
+
+def normalized_key(record):
+    return ('%s:%s' % (record.a, record.b)).strip().lower()
+
+
+class computed_slots_class(SlotsFields.a.b.c["abc"].key[computed(normalized_key, 'a', 'b')]):
+    pass
+
+
+def test_computed_field(benchmark):
+    assert benchmark(attrgetter('key'), computed_slots_class('A ', 'B'))
+
+
+def test_computed_field_uncached(benchmark):
+    assert benchmark(normalized_key, slots_class('A ', 'B'))
+
+
+def test_computed_fields_init(benchmark):
+    assert benchmark(partial(computed_slots_class, a=1, b=2, c=1))
+
+
+class payload_class(SlotsFields.id.payload):
+    pass
+
+
+class keyed_payload_class(factory(slots_class_sealer, key_fields=['id']).id.payload):
+    pass
+
+
+@pytest.mark.parametrize('record_class', [payload_class, keyed_payload_class])
+def test_key_fields_dedupe(benchmark, record_class):
+    records = [record_class(i % 500, tuple(range(i % 7, 200))) for i in range(2000)]
+    assert len(benchmark(set, records)) == (500 if record_class is keyed_payload_class else 2000)
+
+
+@pytest.mark.parametrize('record_class', [payload_class, keyed_payload_class])
+def test_key_fields_eq(benchmark, record_class):
+    payload = list(range(200))
+    assert benchmark(record_class(1, payload).__eq__, record_class(1, list(payload)))
+
+
+@pytest.fixture(scope='module')
+def csv_data():
+    import io
+
+    data = io.StringIO()
+    slots_class.write_csv(data, [slots_class(i, 'name%s' % i, 'city%s' % (i % 10)) for i in range(10000)])
+    return data.getvalue()
+
+
+def test_read_csv(benchmark, csv_data):
+    import io
+
+    assert len(benchmark(lambda: list(slots_class.read_csv(io.StringIO(csv_data))))) == 10000
+
+
+def test_read_csv_dictreader(benchmark, csv_data):
+    import csv
+    import io
+
+    assert len(benchmark(lambda: [slots_class(**row) for row in csv.DictReader(io.StringIO(csv_data))])) == 10000
+
+
+def test_write_csv(benchmark):
+    import io
+
+    records = [slots_class(i, 'name%s' % i, 'city') for i in range(10000)]
+    benchmark(lambda: slots_class.write_csv(io.StringIO(), records))
+
+
+def test_write_csv_dictwriter(benchmark):
+    import csv
+    import io
+
+    records = [slots_class(i, 'name%s' % i, 'city') for i in range(10000)]
+
+    def run():
+        writer = csv.DictWriter(io.StringIO(), slots_class.__fields__)
+        writer.writeheader()
+        writer.writerows({'a': record.a, 'b': record.b, 'c': record.c} for record in records)
+    benchmark(run)
+
+
+@pytest.fixture(scope='module')
+def json_records():
+    return [slots_class(i, 'name%s' % i, i / 3.0) for i in range(10000)]
+
+
+def test_to_json(benchmark, json_records):
+    assert len(benchmark(lambda: [record.to_json() for record in json_records])) == 10000
+
+
+def test_to_json_as_dict(benchmark, json_records):
+    import json
+
+    dict_class = type('DictClass', (ConvertibleFields.a.b.c,), {})
+    records = [dict_class(record.a, record.b, record.c) for record in json_records]
+    assert len(benchmark(lambda: [json.dumps(record.as_dict) for record in records])) == 10000
+
+
+def test_dump_many(benchmark, json_records):
+    import io
+
+    from fields.jsonio import dump_many
+
+    benchmark(lambda: dump_many(json_records, io.StringIO()))
+
+
+def test_dump_many_as_dict(benchmark, json_records):
+    import io
+    import json
+
+    dict_class = type('DictClass', (ConvertibleFields.a.b.c,), {})
+    records = [dict_class(record.a, record.b, record.c) for record in json_records]
+
+    def run():
+        data = io.StringIO()
+        for record in records:
+            data.write(json.dumps(record.as_dict) + '\n')
+    benchmark(run)
+
+
+def test_factory_chain(benchmark):
+    benchmark(lambda: Fields.a.b.c.d['abc'].e[None])
+
+
+def test_factory_chain_fresh(benchmark):
+    benchmark(lambda: factory(class_sealer).a.b.c.d['abc'].e[None])
+
+
+@pytest.mark.parametrize('namespace', [Namespace, ShapedNamespace], ids=['dict', 'shaped'])
+def test_namespace(benchmark, namespace):
+    benchmark(lambda: namespace(user_id=1, name='alice', score=0.5))
+
+
+@pytest.mark.parametrize('namespace', [Namespace, ShapedNamespace], ids=['dict', 'shaped'])
+def test_namespace_eq(benchmark, namespace):
+    first, second = namespace(user_id=1, name='alice', score=0.5), namespace(user_id=1, name='alice', score=0.5)
+    assert benchmark(lambda: first == second)
+
+
+def test_namespace_memory():
+    dict_size = traced_memory(lambda: [Namespace(user_id=i, name='alice', score=0.5) for i in range(10000)])
+    shaped_size = traced_memory(lambda: [ShapedNamespace(user_id=i, name='alice', score=0.5) for i in range(10000)])
+    assert shaped_size < dict_size * 0.5
+
+
+@pytest.mark.parametrize('options', [{}, dict(key_fields=['b'])], ids=['default', 'key_fields'])
+def test_seal_class(benchmark, options):
+    benchmark(lambda: class_sealer(['a', 'b', 'c'], {'c': 'abc'}, **options))
+
+
+def test_seal_class_cold(benchmark):
+    counter = iter(range(10 ** 9))
+    benchmark(lambda: class_sealer(['a%s' % next(counter), 'b', 'c'], {'c': 'abc'}))
+
+
+class factory_default_class(SlotsFields.name.tags[default_factory(list)]):
+    pass
+
+
+class none_default_class(SlotsFields.name.tags[None]):
+    def __init__(self, name, tags=None):
+        if tags is None:
+            tags = []
+        super(none_default_class, self).__init__(name, tags)
+
+
+@pytest.mark.parametrize('cls', [factory_default_class, none_default_class], ids=['default_factory', 'override'])
+def test_default_factory(benchmark, cls):
+    assert benchmark(cls, 'alice').tags == []
+
+
+IMPORT_TIME_BUDGET = 15000  # microseconds, cumulative (as reported by python -X importtime)
+EAGER_IMPORTS = 'ctypes', 'hashlib', 'linecache', 'pickle', 're', 'zlib'
+
+
+def run_python(*args):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    process = subprocess.Popen(
+        [sys.executable, '-S'] + list(args),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, universal_newlines=True
+    )
+    stdout, stderr = process.communicate()
+    assert process.returncode == 0, stderr
+    return stdout, stderr
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="Needs -X importtime")
+def test_import_time():
+    run_python('-c', 'import fields')  # make sure the bytecode is cached
+    timings = []
+    for _ in range(5):
+        _, stderr = run_python('-X', 'importtime', '-c', 'import fields')
+        for line in stderr.splitlines():
+            _, _, cumulative, name = [part.strip() for part in line.replace(':', '|', 1).split('|')]
+            if name == 'fields':
+                timings.append(int(cumulative))
+    if not timings:
+        pytest.skip("No -X importtime output (not CPython 3.7+).")
+    assert min(timings) < IMPORT_TIME_BUDGET
+
+
+def test_import_is_lazy():
+    stdout, _ = run_python('-c', 'import sys; import fields; print(" ".join(sorted(sys.modules)))')
+    modules = stdout.split()
+    assert [name for name in EAGER_IMPORTS if name in modules] == []